@@ -0,0 +1,31 @@
+"""Add composite index for transaction export queries
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-02-25 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tx_user_date',
+        'transactions',
+        ['user_id', sa.text('transaction_date DESC NULLS LAST'), 'type'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tx_user_date', table_name='transactions')
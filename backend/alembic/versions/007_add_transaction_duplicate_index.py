@@ -0,0 +1,31 @@
+"""Add composite index for import duplicate checks
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-02-25 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tx_dup',
+        'transactions',
+        ['user_id', 'amount', 'transaction_date'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tx_dup', table_name='transactions')
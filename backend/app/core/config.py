@@ -7,6 +7,10 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-here"
     DATABASE_URL: str = "postgresql+asyncpg://scrooge:password@db/scrooge_db"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Argon2id cost parameters (RFC 9106 low-memory profile)
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
     CORS_ORIGINS: List[str] = ["http://localhost", "http://localhost:80", "http://localhost:5173"]
     
     class Config:
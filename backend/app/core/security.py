@@ -1,7 +1,11 @@
+import re
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -10,6 +14,32 @@ from app.schemas.user import TokenPayload
 
 security = HTTPBearer()
 
+# A compact JWS is three non-empty base64url segments separated by dots
+_JWT_SEGMENT = re.compile(r"^[A-Za-z0-9_-]+={0,2}$")
+
+
+_JWT_ALGORITHM = "HS256"
+_JWT_ALGORITHMS = (_JWT_ALGORITHM,)
+
+
+@lru_cache(maxsize=None)
+def _build_password_hasher(time_cost: int, memory_cost: int, parallelism: int) -> PasswordHasher:
+    return PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+
+
+def _password_hasher() -> PasswordHasher:
+    """Argon2id hasher configured from settings, built once per parameter set."""
+    return _build_password_hasher(
+        settings.ARGON2_TIME_COST,
+        settings.ARGON2_MEMORY_COST,
+        settings.ARGON2_PARALLELISM,
+    )
+
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    """Hashes created before the switch to Argon2id are bcrypt ($2a$/$2b$/$2y$)."""
+    return hashed_password.startswith("$2")
+
 
 def _truncate_password(password: str) -> bytes:
     """Truncate password to 72 bytes for bcrypt compatibility."""
@@ -17,18 +47,34 @@ def _truncate_password(password: str) -> bytes:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a plain password against a hashed password."""
-    password_bytes = _truncate_password(plain_password)
-    hashed_bytes = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hashed_bytes)
+    """Verify a plain password against a hashed password.
+
+    Accepts Argon2id hashes and legacy bcrypt hashes.
+    """
+    if _is_bcrypt_hash(hashed_password):
+        return bcrypt.checkpw(_truncate_password(plain_password), hashed_password.encode('utf-8'))
+    try:
+        return _password_hasher().verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True for legacy bcrypt hashes and Argon2 hashes with outdated parameters."""
+    if _is_bcrypt_hash(hashed_password):
+        return True
+    try:
+        return _password_hasher().check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return True
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password using bcrypt."""
-    password_bytes = _truncate_password(password)
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    return hashed.decode('utf-8')
+    """Hash a password using Argon2id.
+
+    The whole password is hashed; there is no 72-byte limit as with bcrypt.
+    """
+    return _password_hasher().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -41,13 +87,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=_JWT_ALGORITHM)
     return encoded_jwt
 
 
+def _looks_like_jwt(token: str) -> bool:
+    """Cheap shape check so malformed tokens skip parsing and signature verification."""
+    if token.count(".") != 2:
+        return False
+    return all(_JWT_SEGMENT.match(segment) for segment in token.split("."))
+
+
 def decode_token(token: str) -> Optional[TokenPayload]:
+    if not _looks_like_jwt(token):
+        return None
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=_JWT_ALGORITHMS)
         user_id_str = payload.get("sub")
         if user_id_str is None:
             return None
@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
@@ -21,7 +22,9 @@ app = FastAPI(
     title="Scrooge Budget Tracker API",
     description="API for tracking personal finances",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson renders large payloads such as import previews much faster
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
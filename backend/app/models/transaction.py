@@ -1,6 +1,6 @@
 import enum
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text, Enum, Index
 from sqlalchemy.orm import relationship
 
 from app.core.database import Base
@@ -35,3 +35,12 @@ class Transaction(Base):
 
     user = relationship("User", back_populates="transactions")
     category = relationship("Category", back_populates="transactions")
+
+    __table_args__ = (
+        # Covers export queries: filter by user (and type), newest first.
+        # Migration 006 creates it DESC NULLS LAST on PostgreSQL to match the
+        # export ORDER BY; SQLite can't declare that, but sorts NULLs last anyway.
+        Index('ix_tx_user_date', 'user_id', transaction_date.desc(), 'type'),
+        # Covers import duplicate checks: same user and amount, date window
+        Index('ix_tx_dup', 'user_id', 'amount', 'transaction_date'),
+    )
@@ -14,21 +14,28 @@ from app.models.transaction import TransactionType, TransactionSource
 router = APIRouter()
 
 
-def _write_csv_data(writer, transactions):
-    """Write transaction data to CSV/TSV writer."""
-    for t in transactions:
+# Rows buffered before a chunk is handed to the response stream
+_STREAM_CHUNK_ROWS = 1000
+
+
+async def _transaction_rows(transactions):
+    """Yield CSV/TSV rows for an async stream of transactions."""
+    async for t in transactions:
         amount = float(t.amount) if t.amount else 0
         if t.type == TransactionType.EXPENSE:
             amount = -amount
-        writer.writerow([
+        yield [
             amount, t.category_name or "", t.description or "",
             t.transaction_date.isoformat() if t.transaction_date else "",
             t.created_at.isoformat() if t.created_at else ""
-        ])
+        ]
 
 
-def _write_grouped_data_with_totals(writer, grouped_data):
-    """Write grouped data to CSV/TSV writer with totals row."""
+async def _grouped_rows_with_totals(grouped_data):
+    """Yield grouped CSV/TSV rows followed by the totals row.
+
+    Totals are accumulated while the rows go out, so the data is walked once.
+    """
     total_income = 0.0
     total_expense = 0.0
     
@@ -37,16 +44,48 @@ def _write_grouped_data_with_totals(writer, grouped_data):
             total_income += item['income']
         if item['expense'] is not None:
             total_expense += item['expense']
-        writer.writerow([
+        yield [
             item['income'] if item['income'] is not None else "",
             item['expense'] if item['expense'] is not None else "",
             item['category'],
             item['descriptions']
-        ])
+        ]
     
-    # Write totals row
-    writer.writerow(["", "", "", ""])  # Empty row
-    writer.writerow([total_income, total_expense, "TOTAL", ""])
+    # Totals row
+    yield ["", "", "", ""]  # Empty row
+    yield [total_income, total_expense, "TOTAL", ""]
+
+
+async def _iter_delimited(header, rows, bom=False, **fmtparams):
+    """Encode async rows as CSV/TSV and yield UTF-8 chunks of ``_STREAM_CHUNK_ROWS`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, **fmtparams)
+    if bom:
+        # Lets Excel detect UTF-8; written once, ahead of the header
+        buffer.write('\ufeff')
+    writer.writerow(header)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % _STREAM_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+async def _stream_transactions(db, *args):
+    """Stream export rows from the database, releasing the session's connection at the end.
+
+    The response body is produced after the endpoint returns, so the
+    generator, not the ``get_db`` dependency, is the last user of ``db``.
+    """
+    try:
+        async for t in TransactionService.stream_for_export(db, *args):
+            yield t
+    finally:
+        await db.close()
 
 
 @router.get("/csv")
@@ -68,139 +107,122 @@ async def export_csv(
         )
         
         if format == "tsv":
-            output = io.StringIO()
-            writer = csv.writer(output, delimiter='\t', lineterminator='\n')
-            writer.writerow(["Income", "Expense", "Category", "Descriptions"])
-            _write_grouped_data_with_totals(writer, grouped_data)
-            output.seek(0)
             filename = f"transactions_grouped_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.tsv"
             return StreamingResponse(
-                io.BytesIO(output.getvalue().encode('utf-8')),
+                _iter_delimited(
+                    ["Income", "Expense", "Category", "Descriptions"],
+                    _grouped_rows_with_totals(grouped_data),
+                    delimiter='\t', lineterminator='\n'
+                ),
                 media_type="text/tab-separated-values",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
         
         if format == "xlsx":
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Grouped"
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-            thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-            for col, header in enumerate(["Income", "Expense", "Category", "Descriptions"], 1):
-                cell = ws.cell(row=1, column=col, value=header)
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = thin_border
+            from xlsxwriter import Workbook
+            output = io.BytesIO()
+            # constant_memory flushes every finished row to disk instead of keeping the sheet in RAM
+            wb = Workbook(output, {'constant_memory': True})
+            ws = wb.add_worksheet("Grouped")
+            header_format = wb.add_format({'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#4472C4', 'border': 1})
+            cell_format = wb.add_format({'border': 1})
+            income_format = wb.add_format({'border': 1, 'font_color': '#008000'})
+            expense_format = wb.add_format({'border': 1, 'font_color': '#C00000'})
+            desc_format = wb.add_format({'border': 1, 'text_wrap': True, 'valign': 'top'})
+            ws.freeze_panes(1, 0)
+            ws.write_row(0, 0, ["Income", "Expense", "Category", "Descriptions"], header_format)
             total_income = 0.0
             total_expense = 0.0
-            for row_idx, item in enumerate(grouped_data, 2):
+            for row_idx, item in enumerate(grouped_data, 1):
                 income_val = item['income'] if item['income'] is not None else None
                 if income_val:
                     total_income += income_val
-                cell = ws.cell(row=row_idx, column=1, value=income_val)
-                cell.border = thin_border
-                if income_val:
-                    cell.font = Font(color="008000")
+                ws.write(row_idx, 0, income_val, income_format if income_val else cell_format)
                 expense_val = item['expense'] if item['expense'] is not None else None
                 if expense_val:
                     total_expense += expense_val
-                cell = ws.cell(row=row_idx, column=2, value=expense_val)
-                cell.border = thin_border
-                if expense_val:
-                    cell.font = Font(color="C00000")
-                ws.cell(row=row_idx, column=3, value=item['category']).border = thin_border
-                desc_cell = ws.cell(row=row_idx, column=4, value=item['descriptions'])
-                desc_cell.border = thin_border
-                desc_cell.alignment = Alignment(wrap_text=True, vertical="top")
+                ws.write(row_idx, 1, expense_val, expense_format if expense_val else cell_format)
+                ws.write(row_idx, 2, item['category'], cell_format)
+                ws.write(row_idx, 3, item['descriptions'], desc_format)
             
             # Add totals row
-            total_row = len(grouped_data) + 3
-            ws.cell(row=total_row, column=1, value="").border = thin_border
-            ws.cell(row=total_row, column=2, value="").border = thin_border
-            ws.cell(row=total_row, column=3, value="").border = thin_border
-            ws.cell(row=total_row, column=4, value="").border = thin_border
+            total_row = len(grouped_data) + 2
+            ws.write_row(total_row, 0, ["", "", "", ""], cell_format)
             
             total_row += 1
-            total_income_cell = ws.cell(row=total_row, column=1, value=total_income if total_income else None)
-            total_income_cell.border = thin_border
-            total_income_cell.font = Font(bold=True, color="008000")
-            total_expense_cell = ws.cell(row=total_row, column=2, value=total_expense if total_expense else None)
-            total_expense_cell.border = thin_border
-            total_expense_cell.font = Font(bold=True, color="C00000")
-            total_label_cell = ws.cell(row=total_row, column=3, value="TOTAL")
-            total_label_cell.border = thin_border
-            total_label_cell.font = Font(bold=True)
-            ws.cell(row=total_row, column=4, value="").border = thin_border
+            ws.write(total_row, 0, total_income if total_income else None, wb.add_format({'border': 1, 'bold': True, 'font_color': '#008000'}))
+            ws.write(total_row, 1, total_expense if total_expense else None, wb.add_format({'border': 1, 'bold': True, 'font_color': '#C00000'}))
+            ws.write(total_row, 2, "TOTAL", wb.add_format({'border': 1, 'bold': True}))
+            ws.write(total_row, 3, "", cell_format)
             
-            ws.freeze_panes = "A2"
-            output = io.BytesIO()
-            wb.save(output)
+            wb.close()
             output.seek(0)
             filename = f"transactions_grouped_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
             return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": f"attachment; filename={filename}"})
         
         # CSV grouped
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["Income", "Expense", "Category", "Descriptions"])
-        _write_grouped_data_with_totals(writer, grouped_data)
-        output.seek(0)
         filename = f"transactions_grouped_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
-        return StreamingResponse(io.BytesIO(output.getvalue().encode('utf-8-sig')), media_type="text/csv", headers={"Content-Disposition": f"attachment; filename={filename}"})
+        return StreamingResponse(
+            _iter_delimited(
+                ["Income", "Expense", "Category", "Descriptions"],
+                _grouped_rows_with_totals(grouped_data),
+                bom=True
+            ),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
     
-    # Regular export
-    transactions = await TransactionService.get_all_for_export(db, current_user_id, type, date_from, date_to)
+    # Regular export, streamed straight from the database cursor
+    transactions = _stream_transactions(db, current_user_id, type, date_from, date_to)
     headers = ["Amount", "Category", "Description", "Transaction Date", "Created At"]
     
     if format == "tsv":
         # TSV format for easy copy-paste into Google Sheets
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter='\t', lineterminator='\n')
-        writer.writerow(headers)
-        _write_csv_data(writer, transactions)
-        
-        output.seek(0)
         filename = f"transactions_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.tsv"
         
         return StreamingResponse(
-            io.BytesIO(output.getvalue().encode('utf-8')),
+            _iter_delimited(
+                headers, _transaction_rows(transactions),
+                delimiter='\t', lineterminator='\n'
+            ),
             media_type="text/tab-separated-values",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
     
     elif format == "xlsx":
         # Excel format
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from xlsxwriter import Workbook
         
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Transactions"
+        output = io.BytesIO()
+        # constant_memory flushes every finished row to disk, so memory use
+        # doesn't grow with the number of exported transactions
+        wb = Workbook(output, {'constant_memory': True})
+        ws = wb.add_worksheet("Transactions")
         
-        # Header style
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        # Cell styles
+        header_format = wb.add_format({
+            'bold': True,
+            'font_color': '#FFFFFF',
+            'bg_color': '#4472C4',
+            'align': 'center',
+            'valign': 'vcenter',
+            'border': 1,
+        })
+        cell_format = wb.add_format({'border': 1})
+        amount_format = wb.add_format({'border': 1, 'align': 'right'})
+        negative_amount_format = wb.add_format({'border': 1, 'align': 'right', 'font_color': '#C00000'})
+        
+        # Freeze header row
+        ws.freeze_panes(1, 0)
         
         # Write headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        ws.write_row(0, 0, headers, header_format)
+        column_widths = [len(header) for header in headers]
         
         # Write data
-        for row_idx, t in enumerate(transactions, 2):
+        row_idx = 0
+        async for t in transactions:
+            row_idx += 1
             # Amount: positive for income, negative for expense
             amount = float(t.amount) if t.amount else 0
             if t.type == TransactionType.EXPENSE:
@@ -214,37 +236,19 @@ async def export_csv(
                 t.created_at.isoformat() if t.created_at else ""
             ]
             
-            for col_idx, value in enumerate(row_data, 1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.border = thin_border
-                
-                # Color negative amounts in red
-                if col_idx == 1 and isinstance(value, (int, float)) and value < 0:
-                    cell.font = Font(color="C00000")
-                
-                # Align amount to right
-                if col_idx == 1:
-                    cell.alignment = Alignment(horizontal="right")
+            # Color negative amounts in red, align amount to right
+            ws.write(row_idx, 0, amount, negative_amount_format if amount < 0 else amount_format)
+            ws.write_row(row_idx, 1, row_data[1:], cell_format)
+            
+            for col_idx, value in enumerate(row_data):
+                column_widths[col_idx] = max(column_widths[col_idx], len(str(value)))
         
         # Auto-adjust column widths
-        for col in ws.columns:
-            max_length = 0
-            column = col[0].column_letter
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column].width = adjusted_width
-        
-        # Freeze header row
-        ws.freeze_panes = "A2"
+        for col_idx, width in enumerate(column_widths):
+            ws.set_column(col_idx, col_idx, min(width + 2, 50))
         
         # Save to bytes
-        output = io.BytesIO()
-        wb.save(output)
+        wb.close()
         output.seek(0)
         
         filename = f"transactions_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.xlsx"
@@ -257,16 +261,10 @@ async def export_csv(
     
     else:
         # Default CSV format
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(headers)
-        _write_csv_data(writer, transactions)
-        
-        output.seek(0)
         filename = f"transactions_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
         
         return StreamingResponse(
-            io.BytesIO(output.getvalue().encode('utf-8-sig')),
+            _iter_delimited(headers, _transaction_rows(transactions), bom=True),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
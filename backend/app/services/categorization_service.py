@@ -156,6 +156,12 @@ class CategorizationService:
         r"comcast|verizon|at&t": ("Utilities", "ЖКХ"),
     }
     
+    # Compiled once; checked in order, first match wins
+    _COMPILED_MERCHANT_PATTERNS = [
+        (re.compile(pattern, re.IGNORECASE), categories)
+        for pattern, categories in MERCHANT_PATTERNS.items()
+    ]
+    
     def __init__(self, db: AsyncSession):
         self.db = db
     
@@ -176,29 +182,32 @@ class CategorizationService:
         )
         return result.scalars().all()
     
-    async def _get_mcc_mapping(self, mcc_code: str, language: str = "en") -> Optional[str]:
-        """Get category from MCC code."""
-        if not mcc_code:
-            return None
+    async def _get_mcc_mappings(self, mcc_codes: List[Optional[str]], language: str = "en") -> Dict[str, str]:
+        """Get categories for several MCC codes in one query."""
+        codes = {code for code in mcc_codes if code}
+        if not codes:
+            return {}
         
         result = await self.db.execute(
-            select(MCCCode).where(MCCCode.code == mcc_code)
+            select(MCCCode).where(MCCCode.code.in_(codes))
         )
-        mcc = result.scalar_one_or_none()
         
-        if mcc:
+        mappings = {}
+        for mcc in result.scalars():
             if language == "ru":
-                return mcc.suggested_category_ru or mcc.suggested_category_en
-            return mcc.suggested_category_en or mcc.suggested_category_ru
-        return None
+                category = mcc.suggested_category_ru or mcc.suggested_category_en
+            else:
+                category = mcc.suggested_category_en or mcc.suggested_category_ru
+            if category:
+                mappings[mcc.code] = category
+        return mappings
     
-    async def _match_user_pattern(
-        self, 
-        raw_description: str, 
-        user_id: int
+    def _match_patterns(
+        self,
+        patterns: List[TransactionPattern],
+        raw_description: str
     ) -> Optional[CategorySuggestion]:
-        """Match against user's learned patterns."""
-        patterns = await self._get_user_patterns(user_id)
+        """Match against already loaded user patterns."""
         normalized = self._normalize_text(raw_description)
         
         for pattern in patterns:
@@ -240,8 +249,8 @@ class CategorizationService:
         """Match against predefined regex patterns."""
         normalized = raw_description.lower()
         
-        for pattern, categories in self.MERCHANT_PATTERNS.items():
-            if re.search(pattern, normalized, re.IGNORECASE):
+        for pattern, categories in self._COMPILED_MERCHANT_PATTERNS:
+            if pattern.search(normalized):
                 # Check if this is an income pattern (has 3 elements)
                 if len(categories) == 3:
                     category = categories[0]  # Use English version
@@ -256,13 +265,8 @@ class CategorizationService:
         
         return None
     
-    async def _match_transaction_history(
-        self, 
-        raw_description: str, 
-        user_id: int
-    ) -> Optional[CategorySuggestion]:
-        """Match against user's transaction history."""
-        # Get recent transactions with similar descriptions
+    async def _get_recent_transactions(self, user_id: int) -> List[Transaction]:
+        """Get user's recent transactions with descriptions for history matching."""
         result = await self.db.execute(
             select(Transaction)
             .where(Transaction.user_id == user_id)
@@ -270,8 +274,14 @@ class CategorizationService:
             .order_by(desc(Transaction.created_at))
             .limit(100)
         )
-        transactions = result.scalars().all()
-        
+        return result.scalars().all()
+    
+    def _match_history(
+        self,
+        transactions: List[Transaction],
+        raw_description: str
+    ) -> Optional[CategorySuggestion]:
+        """Match against already loaded transaction history."""
         best_match = None
         best_score = 0
         
@@ -314,62 +324,98 @@ class CategorizationService:
         4. Fuzzy match on transaction history
         5. Default category (requires manual review)
         """
-        if not raw_description or raw_description.strip() == "":
-            return {
-                "category": "Other" if language == "en" else "Другое",
-                "confidence": "low",
-                "score": 0.0
-            }
+        results = await self.categorize_many(user_id, [(raw_description, mcc_code)], language)
+        return results[0]
+    
+    async def categorize_many(
+        self,
+        user_id: int,
+        items: List[Tuple[str, Optional[str]]],
+        language: str = "en"
+    ) -> List[Dict[str, Any]]:
+        """
+        Categorize several (raw_description, mcc_code) pairs, see ``categorize``.
         
-        # 1. Check user's learned patterns
-        suggestion = await self._match_user_pattern(raw_description, user_id)
-        if suggestion and suggestion.score >= 0.9:
-            return {
-                "category": suggestion.category,
-                "confidence": "high",
-                "score": suggestion.score
-            }
+        User patterns and MCC codes are loaded once for the whole batch, and
+        transaction history once on first need, instead of per transaction.
+        """
+        patterns = None
+        mcc_mappings = None
+        history = None
+        results = []
         
-        # 2. Check MCC code
-        if mcc_code:
-            mcc_category = await self._get_mcc_mapping(mcc_code, language)
+        for raw_description, mcc_code in items:
+            if not raw_description or raw_description.strip() == "":
+                results.append(self._default_result(language))
+                continue
+            
+            if patterns is None:
+                patterns = await self._get_user_patterns(user_id)
+                mcc_mappings = await self._get_mcc_mappings(
+                    [code for _, code in items], language
+                )
+            
+            # 1. Check user's learned patterns
+            suggestion = self._match_patterns(patterns, raw_description)
+            if suggestion and suggestion.score >= 0.9:
+                results.append({
+                    "category": suggestion.category,
+                    "confidence": "high",
+                    "score": suggestion.score
+                })
+                continue
+            
+            # 2. Check MCC code
+            mcc_category = mcc_mappings.get(mcc_code) if mcc_code else None
             if mcc_category:
-                return {
+                results.append({
                     "category": mcc_category,
                     "confidence": "high",
                     "score": 0.85
-                }
-        
-        # 3. Check regex patterns
-        regex_match = self._match_regex_patterns(raw_description, language)
-        if regex_match:
-            return {
-                "category": regex_match.category,
-                "confidence": "medium",
-                "score": regex_match.score
-            }
-        
-        # 4. Check transaction history
-        history_match = await self._match_transaction_history(raw_description, user_id)
-        if history_match and history_match.score >= 0.8:
-            return {
-                "category": history_match.category,
-                "confidence": "medium",
-                "score": history_match.score
-            }
-        
-        # 5. If we had a pattern match earlier with lower confidence
-        if suggestion and suggestion.score >= 0.7:
-            return {
-                "category": suggestion.category,
-                "confidence": "medium",
-                "score": suggestion.score
-            }
+                })
+                continue
+            
+            # 3. Check regex patterns
+            regex_match = self._match_regex_patterns(raw_description, language)
+            if regex_match:
+                results.append({
+                    "category": regex_match.category,
+                    "confidence": "medium",
+                    "score": regex_match.score
+                })
+                continue
+            
+            # 4. Check transaction history
+            if history is None:
+                history = await self._get_recent_transactions(user_id)
+            history_match = self._match_history(history, raw_description)
+            if history_match and history_match.score >= 0.8:
+                results.append({
+                    "category": history_match.category,
+                    "confidence": "medium",
+                    "score": history_match.score
+                })
+                continue
+            
+            # 5. If we had a pattern match earlier with lower confidence
+            if suggestion and suggestion.score >= 0.7:
+                results.append({
+                    "category": suggestion.category,
+                    "confidence": "medium",
+                    "score": suggestion.score
+                })
+                continue
+            
+            # 6. Default - requires manual review
+            results.append(self._default_result(language))
         
-        # 6. Default - requires manual review
-        default_category = "Other" if language == "en" else "Другое"
+        return results
+    
+    @staticmethod
+    def _default_result(language: str) -> Dict[str, Any]:
+        """Default category that requires manual review."""
         return {
-            "category": default_category,
+            "category": "Other" if language == "en" else "Другое",
             "confidence": "low",
             "score": 0.0
         }
@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 
 import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
 from thefuzz import fuzz
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -14,6 +15,13 @@ from app.models.transaction import TransactionType
 from app.services.category_service import CategoryService
 from app.services.categorization_service import CategorizationService
 
+try:
+    import pyarrow
+    import pyarrow.csv  # multithreaded CSV reader
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 
 @dataclass
 class ParsedTransaction:
@@ -37,20 +45,57 @@ class BaseBankAdapter:
     
     # Column name mappings - override in subclasses
     COLUMN_MAPPINGS = {}
+    # Lowercase headers a statement must have for this adapter to claim it
+    REQUIRED_COLUMNS: frozenset = frozenset()
     ENCODING = "utf-8"
+    DATE_FORMATS = ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"]
+    
+    @staticmethod
+    def _columns(df: pd.DataFrame) -> frozenset:
+        """Lowercased column names of the dataframe."""
+        return frozenset(df.columns.str.lower())
     
     @classmethod
     def detect(cls, df: pd.DataFrame) -> bool:
         """Detect if this adapter can handle the given dataframe."""
-        columns = set(df.columns.str.lower())
-        required = set(cls.COLUMN_MAPPINGS.keys())
-        return required.issubset(columns)
+        return cls.REQUIRED_COLUMNS.issubset(cls._columns(df))
     
     @classmethod
     def parse(cls, df: pd.DataFrame) -> List[ParsedTransaction]:
         """Parse dataframe into list of transactions."""
         raise NotImplementedError
     
+    @classmethod
+    def _column(cls, df: pd.DataFrame, name: str, default: Any = None) -> pd.Series:
+        """Return column ``name``, or ``default`` for every row if the statement lacks it."""
+        if name in df.columns:
+            return df[name]
+        return pd.Series([default] * len(df), index=df.index, dtype=object)
+    
+    @classmethod
+    def _as_str(cls, values: pd.Series) -> pd.Series:
+        """Apply ``str()`` to every value, so NaN becomes ``"nan"`` just like ``str(row[col])``."""
+        # pandas' string dtype keeps missing values missing, unlike str()
+        return values.astype(str).fillna("nan")
+    
+    @classmethod
+    def _clean_amounts(cls, values: pd.Series) -> pd.Series:
+        """Amounts as strings without spaces, with a dot as the decimal separator."""
+        return (
+            cls._as_str(values)
+            .str.replace(" ", "", regex=False)
+            .str.replace("\xa0", "", regex=False)
+            .str.replace(",", ".", regex=False)
+        )
+    
+    @staticmethod
+    def _to_decimal(cleaned: str) -> Decimal:
+        """Decimal from a cleaned amount string, 0 if it isn't a number."""
+        try:
+            return Decimal(cleaned)
+        except InvalidOperation:
+            return Decimal("0")
+    
     @classmethod
     def _normalize_amount(cls, value: Any) -> Decimal:
         """Normalize amount to Decimal."""
@@ -59,11 +104,20 @@ class BaseBankAdapter:
         if isinstance(value, (int, float)):
             return Decimal(str(value))
         # Remove spaces, replace comma with dot
-        cleaned = str(value).replace(" ", "").replace(",", ".").replace("\xa0", "")
-        try:
-            return Decimal(cleaned)
-        except InvalidOperation:
-            return Decimal("0")
+        return cls._to_decimal(str(value).replace(" ", "").replace(",", ".").replace("\xa0", ""))
+    
+    @classmethod
+    def _normalize_amounts(cls, values: pd.Series) -> List[Decimal]:
+        """Normalize a whole column of amounts to Decimals.
+        
+        The string cleanup runs on the whole column; only building the
+        Decimals is per value, as there is no vectorized Decimal type.
+        """
+        cleaned = cls._clean_amounts(values)
+        return [
+            Decimal("0") if is_missing else cls._to_decimal(amount)
+            for amount, is_missing in zip(cleaned.tolist(), values.isna().tolist())
+        ]
     
     @classmethod
     def _parse_date(cls, value: Any, formats: List[str] = None) -> Optional[datetime]:
@@ -71,7 +125,7 @@ class BaseBankAdapter:
         if pd.isna(value):
             return None
         
-        formats = formats or ["%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"]
+        formats = formats or cls.DATE_FORMATS
         date_str = str(value).strip()
         
         for fmt in formats:
@@ -85,6 +139,38 @@ class BaseBankAdapter:
             return pd.to_datetime(value, dayfirst=True).to_pydatetime()
         except:
             return None
+    
+    @classmethod
+    def _parse_dates(cls, values: pd.Series, formats: List[str] = None) -> List[Optional[datetime]]:
+        """Parse a whole column of dates.
+        
+        Each format is applied to the still-unparsed rows in one pass; rows no
+        format matches go through ``_parse_date`` and its free-form fallback.
+        """
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # The CSV reader already recognised these as timestamps
+            return [timestamp.to_pydatetime() if pd.notna(timestamp) else None for timestamp in values.tolist()]
+        
+        formats = formats or cls.DATE_FORMATS
+        missing = values.isna()
+        date_strs = cls._as_str(values).str.strip()
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        
+        for fmt in formats:
+            pending = parsed.isna() & ~missing
+            if not pending.any():
+                break
+            parsed[pending] = pd.to_datetime(date_strs[pending], format=fmt, errors="coerce")
+        
+        dates = []
+        for value, is_missing, timestamp in zip(values.tolist(), missing.tolist(), parsed.tolist()):
+            if is_missing:
+                dates.append(None)
+            elif pd.notna(timestamp):
+                dates.append(timestamp.to_pydatetime())
+            else:
+                dates.append(cls._parse_date(value, formats))
+        return dates
 
 
 class TinkoffAdapter(BaseBankAdapter):
@@ -107,31 +193,41 @@ class TinkoffAdapter(BaseBankAdapter):
         "округление на облучение": "rounding",
         "сумма операции с округлением": "rounded_amount",
     }
+    # Tinkoff-specific columns
+    REQUIRED_COLUMNS = frozenset({"дата операции", "описание", "сумма операции", "категория"})
     ENCODING = "utf-8"
     
-    @classmethod
-    def detect(cls, df: pd.DataFrame) -> bool:
-        columns = set(df.columns.str.lower())
-        # Tinkoff-specific columns
-        tinkoff_cols = {"дата операции", "описание", "сумма операции", "категория"}
-        return tinkoff_cols.issubset(columns)
-    
     @classmethod
     def parse(cls, df: pd.DataFrame) -> List[ParsedTransaction]:
-        transactions = []
+        # Skip non-completed transactions
+        status = cls._as_str(cls._column(df, "статус", "")).str.lower()
+        df = df[~status.isin(["failed", "отменен", "declined"])]
         
-        for idx, row in df.iterrows():
-            # Skip non-completed transactions
-            status = str(row.get("статус", "")).lower()
-            if status in ("failed", "отменен", "declined"):
-                continue
-            
-            # Determine amount and type
-            raw_amount = row.get("сумма операции")
-            amount = cls._normalize_amount(raw_amount)
-            if amount == 0:
-                amount = cls._normalize_amount(row.get("сумма платежа"))
-            
+        # Determine amount; fall back to payment amount when operation amount is zero
+        amounts = cls._normalize_amounts(cls._column(df, "сумма операции"))
+        payment_amounts = cls._normalize_amounts(cls._column(df, "сумма платежа"))
+        amounts = [amount if amount != 0 else payment for amount, payment in zip(amounts, payment_amounts)]
+        
+        # Parse date (with time from "Дата операции")
+        dates = cls._parse_dates(cls._column(df, "дата операции"), formats=["%d.%m.%Y %H:%M:%S", "%d.%m.%Y"])
+        
+        # Get description
+        descriptions = cls._as_str(cls._column(df, "описание", "")).str.strip().tolist()
+        
+        # Get MCC (clean up - remove .0 suffix from numeric values, limit to 4 chars)
+        mcc_codes = [
+            str(int(float(mcc_raw))).strip()[:4] if pd.notna(mcc_raw) else None
+            for mcc_raw in cls._column(df, "mcc").tolist()
+        ]
+        
+        # Get category from CSV (bank's own categorization)
+        csv_categories = [
+            str(category).strip() if pd.notna(category) else None
+            for category in cls._column(df, "категория").tolist()
+        ]
+        
+        transactions = []
+        for amount, date, description, mcc, csv_category in zip(amounts, dates, descriptions, mcc_codes, csv_categories):
             # Income if amount > 0, expense if < 0
             if amount > 0:
                 tx_type = TransactionType.INCOME
@@ -139,22 +235,6 @@ class TinkoffAdapter(BaseBankAdapter):
                 tx_type = TransactionType.EXPENSE
                 amount = abs(amount)
             
-            # Parse date (with time from "Дата операции")
-            date = cls._parse_date(row.get("дата операции"), formats=["%d.%m.%Y %H:%M:%S", "%d.%m.%Y"])
-            
-            # Get description
-            description = str(row.get("описание", "")).strip()
-            
-            # Get MCC (clean up - remove .0 suffix from numeric values, limit to 4 chars)
-            mcc_raw = row.get("mcc")
-            if pd.notna(mcc_raw):
-                mcc = str(int(float(mcc_raw))).strip()[:4]
-            else:
-                mcc = None
-            
-            # Get category from CSV (bank's own categorization)
-            csv_category = str(row.get("категория", "")).strip() if pd.notna(row.get("категория")) else None
-            
             transactions.append(ParsedTransaction(
                 raw_description=description,
                 amount=amount,
@@ -181,25 +261,36 @@ class SberAdapter(BaseBankAdapter):
         "описание": "description",
         "сумма": "amount",
     }
+    # Sber-specific columns
+    REQUIRED_COLUMNS = frozenset({"дата", "сумма", "описание"})
     ENCODING = "cp1251"  # Sber uses Windows-1251
     
     @classmethod
     def detect(cls, df: pd.DataFrame) -> bool:
-        columns = set(df.columns.str.lower())
-        # Sber-specific columns
-        sber_cols = {"дата", "сумма", "описание"}
-        return sber_cols.issubset(columns) and "дата операции" not in columns
+        columns = cls._columns(df)
+        return cls.REQUIRED_COLUMNS.issubset(columns) and "дата операции" not in columns
     
     @classmethod
     def parse(cls, df: pd.DataFrame) -> List[ParsedTransaction]:
-        transactions = []
+        # Parse amount - Sber uses +/- format; remove spaces and normalize
+        amount_strs = cls._clean_amounts(cls._column(df, "сумма", "0"))
+        type_cols = cls._as_str(cls._column(df, "тип", "")).str.lower()
+        # A type column naming income, for amounts without an explicit sign
+        income_by_type = type_cols.str.contains("доход|приход|зачисление|income", regex=True)
         
-        for _, row in df.iterrows():
-            # Parse amount - Sber uses +/- format
-            amount_str = str(row.get("сумма", "0"))
-            # Remove spaces and normalize
-            amount_str = amount_str.replace(" ", "").replace("\xa0", "").replace(",", ".")
-            
+        # Parse date
+        dates = cls._parse_dates(cls._column(df, "дата"))
+        if None in dates:
+            fallback_dates = cls._parse_dates(cls._column(df, "дата операции"))
+            dates = [date if date is not None else fallback for date, fallback in zip(dates, fallback_dates)]
+        
+        # Get description
+        descriptions = cls._as_str(cls._column(df, "описание", "")).str.strip().tolist()
+        
+        transactions = []
+        for amount_str, is_income, date, description in zip(
+            amount_strs.tolist(), income_by_type.tolist(), dates, descriptions
+        ):
             # Determine type based on sign or column
             if amount_str.startswith("-"):
                 tx_type = TransactionType.EXPENSE
@@ -208,21 +299,8 @@ class SberAdapter(BaseBankAdapter):
                 tx_type = TransactionType.INCOME
                 amount = cls._normalize_amount(amount_str[1:])
             else:
-                # Try to determine from separate column
                 amount = cls._normalize_amount(amount_str)
-                tx_type_col = str(row.get("тип", "")).lower()
-                if any(x in tx_type_col for x in ("доход", "приход", "зачисление", "income")):
-                    tx_type = TransactionType.INCOME
-                else:
-                    tx_type = TransactionType.EXPENSE
-            
-            # Parse date
-            date = cls._parse_date(row.get("дата"))
-            if date is None:
-                date = cls._parse_date(row.get("дата операции"))
-            
-            # Get description
-            description = str(row.get("описание", "")).strip()
+                tx_type = TransactionType.INCOME if is_income else TransactionType.EXPENSE
             
             transactions.append(ParsedTransaction(
                 raw_description=description,
@@ -247,23 +325,27 @@ class AlfaAdapter(BaseBankAdapter):
         "контрагент": "counterparty",
         "счет": "account",
     }
+    # Alfa-specific: separate income/expense columns
+    REQUIRED_COLUMNS = frozenset({"приход", "расход"})
     ENCODING = "utf-8"
     
-    @classmethod
-    def detect(cls, df: pd.DataFrame) -> bool:
-        columns = set(df.columns.str.lower())
-        # Alfa-specific: separate income/expense columns
-        alfa_cols = {"приход", "расход"}  # Income and expense columns
-        return alfa_cols.issubset(columns)
-    
     @classmethod
     def parse(cls, df: pd.DataFrame) -> List[ParsedTransaction]:
-        transactions = []
+        incomes = cls._normalize_amounts(cls._column(df, "приход", 0))
+        expenses = cls._normalize_amounts(cls._column(df, "расход", 0))
         
-        for _, row in df.iterrows():
-            income = cls._normalize_amount(row.get("приход", 0))
-            expense = cls._normalize_amount(row.get("расход", 0))
-            
+        # Parse date
+        dates = cls._parse_dates(cls._column(df, "дата"))
+        
+        # Get description
+        if "назначение платежа" in df.columns:
+            descriptions = df["назначение платежа"]
+        else:
+            descriptions = cls._column(df, "описание", "")
+        descriptions = cls._as_str(descriptions).str.strip().tolist()
+        
+        transactions = []
+        for income, expense, date, description in zip(incomes, expenses, dates, descriptions):
             if income > 0:
                 tx_type = TransactionType.INCOME
                 amount = income
@@ -273,12 +355,6 @@ class AlfaAdapter(BaseBankAdapter):
             else:
                 continue  # Skip zero transactions
             
-            # Parse date
-            date = cls._parse_date(row.get("дата"))
-            
-            # Get description
-            description = str(row.get("назначение платежа", row.get("описание", ""))).strip()
-            
             transactions.append(ParsedTransaction(
                 raw_description=description,
                 amount=amount,
@@ -328,27 +404,25 @@ class GenericAdapter(BaseBankAdapter):
         if not amount_col or not desc_col:
             raise ValueError("Could not identify required columns (amount, description)")
         
-        transactions = []
+        amounts = cls._normalize_amounts(df[amount_col])
+        dates = cls._parse_dates(df[date_col]) if date_col else [None] * len(df)
+        descriptions = cls._as_str(df[desc_col]).str.strip().tolist()
         
-        for _, row in df.iterrows():
-            amount = cls._normalize_amount(row.get(amount_col))
-            
-            # Try to determine type from sign or separate column
+        # Type from a separate column (first one named like "type"), if present
+        type_col = next((col for col in columns if any(x in col.lower() for x in ["тип", "type"])), None)
+        if type_col is not None:
+            income_by_type = cls._as_str(df[type_col]).str.lower().str.contains("доход|приход|income", regex=True).tolist()
+        else:
+            income_by_type = [False] * len(df)
+        
+        transactions = []
+        for amount, is_income, date, description in zip(amounts, income_by_type, dates, descriptions):
+            # Determine type from sign or the type column
             if amount < 0:
                 tx_type = TransactionType.EXPENSE
                 amount = abs(amount)
             else:
-                # Check if there's a type column
-                tx_type = TransactionType.EXPENSE  # Default to expense
-                for col in columns:
-                    if any(x in col.lower() for x in ["тип", "type"]):
-                        type_val = str(row.get(col, "")).lower()
-                        if any(x in type_val for x in ["доход", "приход", "income"]):
-                            tx_type = TransactionType.INCOME
-                        break
-            
-            date = cls._parse_date(row.get(date_col)) if date_col else None
-            description = str(row.get(desc_col, "")).strip()
+                tx_type = TransactionType.INCOME if is_income else TransactionType.EXPENSE
             
             transactions.append(ParsedTransaction(
                 raw_description=description,
@@ -367,6 +441,9 @@ ADAPTERS = [TinkoffAdapter, SberAdapter, AlfaAdapter, GenericAdapter]
 class ImportService:
     """Service for importing bank statements."""
     
+    # Rows read to sniff encoding and separator before the full parse
+    SNIFF_ROWS = 50
+    
     @staticmethod
     def detect_adapter(df: pd.DataFrame) -> type:
         """Detect the appropriate adapter for the dataframe."""
@@ -375,12 +452,44 @@ class ImportService:
                 return adapter
         return GenericAdapter
     
+    @staticmethod
+    def _read_csv(content: bytes, encoding: str, sep: str, columns: List[str]) -> pd.DataFrame:
+        """Read every cell as a string, with pyarrow when available, else pandas' C engine.
+        
+        Values are never type-inferred, so both engines return the same frame
+        and the adapters parse amounts and dates themselves (pyarrow would read
+        big integers as floats and mixed date columns as timestamps). pyarrow
+        parses multithreaded but is stricter (e.g. about ragged rows), so
+        anything it rejects is retried with the C engine. ``columns`` are the
+        header names as pandas read them while sniffing.
+        """
+        if PYARROW_AVAILABLE:
+            try:
+                table = pyarrow.csv.read_csv(
+                    io.BytesIO(content),
+                    read_options=pyarrow.csv.ReadOptions(column_names=columns, skip_rows=1, encoding=encoding),
+                    parse_options=pyarrow.csv.ParseOptions(delimiter=sep, newlines_in_values=True),
+                    convert_options=pyarrow.csv.ConvertOptions(
+                        column_types={column: pyarrow.string() for column in columns},
+                        null_values=list(STR_NA_VALUES),
+                        strings_can_be_null=True,
+                    ),
+                )
+                return table.to_pandas()
+            except (pyarrow.lib.ArrowInvalid, ValueError, pd.errors.ParserError):
+                pass
+        return pd.read_csv(io.BytesIO(content), encoding=encoding, sep=sep, dtype=str)
+    
     @staticmethod
     def parse_csv(content: bytes, filename: str = "") -> Tuple[List[ParsedTransaction], str]:
         """Parse CSV file content."""
         # Try different encodings
         encodings = ["utf-8", "cp1251", "cp1252", "iso-8859-1"]
         
+        # Encoding and separator are sniffed on the first rows only, so the
+        # whole file is parsed once instead of once per rejected guess. The
+        # parser reads those rows from the full buffer, so quoted multi-line
+        # cells are never cut in half.
         df = None
         used_encoding = "utf-8"
         
@@ -389,8 +498,14 @@ class ImportService:
                 # Try with different separators
                 for sep in [',', '\t', ';']:
                     try:
-                        df = pd.read_csv(io.BytesIO(content), encoding=encoding, sep=sep)
-                        if len(df.columns) > 1:  # Valid CSV/TSV should have multiple columns
+                        head = pd.read_csv(
+                            io.BytesIO(content), encoding=encoding, sep=sep,
+                            nrows=ImportService.SNIFF_ROWS
+                        )
+                        if len(head.columns) <= 1:  # Valid CSV/TSV should have multiple columns
+                            continue
+                        df = ImportService._read_csv(content, encoding, sep, list(head.columns))
+                        if len(df.columns) > 1:
                             used_encoding = encoding
                             break
                     except:
@@ -428,17 +543,15 @@ class ImportService:
         """Check each transaction for potential duplicates in database."""
         from app.services.transaction_service import TransactionService
         
-        for tx in transactions:
-            duplicates = await TransactionService.find_duplicates(
-                db,
-                user_id,
-                tx.raw_description,
-                tx.amount,
-                tx.transaction_date
-            )
-            if duplicates:
+        counts = await TransactionService.count_duplicates(
+            db,
+            user_id,
+            [(tx.raw_description, tx.amount, tx.transaction_date) for tx in transactions]
+        )
+        for tx, count in zip(transactions, counts):
+            if count:
                 tx.is_duplicate = True
-                tx.duplicate_count = len(duplicates)
+                tx.duplicate_count = count
         
         return transactions
     
@@ -452,15 +565,15 @@ class ImportService:
         """Categorize parsed transactions using hybrid approach."""
         categorization_service = CategorizationService(db)
         
-        for tx in transactions:
+        # Patterns, MCC codes and history are loaded once for the whole batch
+        results = await categorization_service.categorize_many(
+            user_id,
+            [(tx.raw_description, tx.mcc_code) for tx in transactions],
+            language
+        )
+        
+        for tx, result in zip(transactions, results):
             # Check user's learned patterns first (highest priority)
-            result = await categorization_service.categorize(
-                user_id=user_id,
-                raw_description=tx.raw_description,
-                mcc_code=tx.mcc_code,
-                language=language
-            )
-            
             # If user has a pattern - use it
             if result["confidence"] == "high":
                 tx.suggested_category = result["category"]
@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_, or_
-from typing import Optional, List, Tuple
+from sqlalchemy import select, func, desc, and_, or_, case
+from typing import AsyncIterator, Optional, List, Tuple
 from decimal import Decimal
 from datetime import datetime, timezone, timedelta
 
@@ -8,6 +8,10 @@ from app.models.transaction import Transaction, TransactionType, TransactionSour
 from app.services.category_service import CategoryService
 from app.schemas.transaction import TransactionCreate, TransactionFilter
 
+# Joins descriptions inside SQL string aggregation; a control character so it
+# can't collide with anything a user types into a description
+_DESCRIPTION_SEPARATOR = "\x1f"
+
 
 class TransactionService:
     @staticmethod
@@ -63,14 +67,13 @@ class TransactionService:
         return dt
 
     @staticmethod
-    async def get_all_for_export(
-        db: AsyncSession,
+    def _export_query(
         user_id: int,
         type: Optional[TransactionType] = None,
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None
-    ) -> List[Transaction]:
-        """Get all transactions for CSV export (no pagination limit)."""
+    ):
+        """Build the export query: user's transactions, newest first."""
         query = select(Transaction).where(Transaction.user_id == user_id)
         
         if type:
@@ -85,12 +88,41 @@ class TransactionService:
             date_to = TransactionService._normalize_datetime(date_to)
             query = query.where(Transaction.transaction_date <= date_to)
         
-        # Order by transaction_date desc
-        query = query.order_by(desc(Transaction.transaction_date))
-        
+        # Order by transaction_date desc; undated rows last on every backend
+        # (PostgreSQL would put NULLs first under a bare DESC)
+        return query.order_by(Transaction.transaction_date.desc().nulls_last())
+
+    @staticmethod
+    async def get_all_for_export(
+        db: AsyncSession,
+        user_id: int,
+        type: Optional[TransactionType] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None
+    ) -> List[Transaction]:
+        """Get all transactions for CSV export (no pagination limit)."""
+        query = TransactionService._export_query(user_id, type, date_from, date_to)
         result = await db.execute(query)
         return result.scalars().all()
 
+    @staticmethod
+    async def stream_for_export(
+        db: AsyncSession,
+        user_id: int,
+        type: Optional[TransactionType] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Transaction]:
+        """Yield transactions for export, fetching ``batch_size`` rows at a time.
+
+        Uses a server-side cursor, so memory doesn't grow with the export size.
+        """
+        query = TransactionService._export_query(user_id, type, date_from, date_to)
+        result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+        async for transaction in result:
+            yield transaction
+
     @staticmethod
     async def get_grouped_for_export(
         db: AsyncSession,
@@ -102,10 +134,18 @@ class TransactionService:
         """Get transactions grouped by category for export. 
         Returns list of dicts with category, income, expense, descriptions.
         Income categories come first, then Expense."""
-        from sqlalchemy import func
+        # Empty names fall back like NULLs did in `category_name or "Uncategorized"`
+        category = func.coalesce(func.nullif(Transaction.category_name, ""), "Uncategorized")
+        is_income = Transaction.type == TransactionType.INCOME
         
-        # First, get all transactions with descriptions
-        query = select(Transaction).where(Transaction.user_id == user_id)
+        # Aggregate per (category, description) first so that each distinct
+        # description is concatenated only once in the outer query
+        query = select(
+            category.label("category"),
+            func.nullif(Transaction.description, "").label("description"),
+            func.sum(case((is_income, Transaction.amount), else_=0)).label("income"),
+            func.sum(case((is_income, 0), else_=Transaction.amount)).label("expense"),
+        ).where(Transaction.user_id == user_id)
         
         if type:
             query = query.where(Transaction.type == type)
@@ -119,49 +159,41 @@ class TransactionService:
             date_to = TransactionService._normalize_datetime(date_to)
             query = query.where(Transaction.transaction_date <= date_to)
         
-        result = await db.execute(query)
-        transactions = result.scalars().all()
-        
-        # Group by category and collect descriptions
-        grouped = {}
-        for t in transactions:
-            category = t.category_name or "Uncategorized"
-            if category not in grouped:
-                grouped[category] = {
-                    'income': 0.0, 
-                    'expense': 0.0,
-                    'descriptions': set()
-                }
-            
-            amount = float(t.amount) if t.amount else 0.0
-            if t.type == TransactionType.INCOME:
-                grouped[category]['income'] += amount
-            else:
-                grouped[category]['expense'] -= amount  # Negative for expense
-            
-            if t.description:
-                grouped[category]['descriptions'].add(t.description)
+        per_description = query.group_by(category, Transaction.description).subquery()
+        
+        # Sums and description concatenation per category, done by the database
+        # (group_concat on SQLite, string_agg on PostgreSQL)
+        result = await db.execute(
+            select(
+                per_description.c.category,
+                func.sum(per_description.c.income),
+                func.sum(per_description.c.expense),
+                func.aggregate_strings(per_description.c.description, _DESCRIPTION_SEPARATOR),
+            ).group_by(per_description.c.category)
+        )
         
         # Convert to list of dicts - Income first, then Expense
         income_list = []
         expense_list = []
         
-        for category, data in grouped.items():
+        for category_name, income, expense, descriptions in result.all():
+            income = float(income or 0)
+            expense = -float(expense or 0)  # Negative for expense
             item = {
-                'category': category,
-                'income': data['income'] if data['income'] != 0 else None,
-                'expense': data['expense'] if data['expense'] != 0 else None,
-                'descriptions': '\n'.join(sorted(data['descriptions'])) if data['descriptions'] else ''
+                'category': category_name,
+                'income': income if income != 0 else None,
+                'expense': expense if expense != 0 else None,
+                'descriptions': '\n'.join(sorted(descriptions.split(_DESCRIPTION_SEPARATOR))) if descriptions else ''
             }
             
             # Determine if this is income or expense category
-            if data['income'] != 0 and data['expense'] == 0:
+            if income != 0 and expense == 0:
                 income_list.append(item)
-            elif data['expense'] != 0 and data['income'] == 0:
+            elif expense != 0 and income == 0:
                 expense_list.append(item)
             else:
                 # Mixed - add to appropriate list based on which is larger
-                if abs(data['income']) >= abs(data['expense']):
+                if abs(income) >= abs(expense):
                     income_list.append(item)
                 else:
                     expense_list.append(item)
@@ -362,3 +394,62 @@ class TransactionService:
         
         result = await db.execute(query)
         return result.scalars().all()
+
+    @staticmethod
+    def _description_matches(existing: Transaction, description: str) -> bool:
+        """Same test as ``find_duplicates``: exact match, or case-insensitive substring."""
+        needle = description.lower()
+        for value in (existing.raw_description, existing.description):
+            if value is not None and (value == description or needle in value.lower()):
+                return True
+        return False
+
+    @staticmethod
+    async def count_duplicates(
+        db: AsyncSession,
+        user_id: int,
+        candidates: List[Tuple[str, Decimal, Optional[datetime]]],
+        days_tolerance: int = 1
+    ) -> List[int]:
+        """Count potential duplicates for many ``(description, amount, date)`` candidates at once.
+        
+        Same rules as ``find_duplicates``, but one query fetches every existing
+        transaction with a matching amount (inside the overall date window) and
+        the per-candidate checks run in memory.
+        """
+        if not candidates:
+            return []
+        
+        tolerance = timedelta(days=days_tolerance)
+        query = select(Transaction).where(
+            Transaction.user_id == user_id,
+            Transaction.amount.in_({abs(amount) for _, amount, _ in candidates})
+        )
+        
+        # A candidate without a date matches on any date, so only bound the
+        # window when every candidate has one
+        dates = [transaction_date for _, _, transaction_date in candidates]
+        if all(dates):
+            query = query.where(
+                Transaction.transaction_date >= min(dates) - tolerance,
+                Transaction.transaction_date <= max(dates) + tolerance
+            )
+        
+        result = await db.execute(query)
+        by_amount = {}
+        for existing in result.scalars():
+            by_amount.setdefault(existing.amount, []).append(existing)
+        
+        counts = []
+        for description, amount, transaction_date in candidates:
+            count = 0
+            for existing in by_amount.get(abs(amount), ()):
+                if transaction_date:
+                    if existing.transaction_date is None:
+                        continue
+                    if abs(existing.transaction_date - transaction_date) > tolerance:
+                        continue
+                if TransactionService._description_matches(existing, description):
+                    count += 1
+            counts.append(count)
+        return counts
@@ -5,7 +5,7 @@ from typing import Optional, List
 
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionType
-from app.core.security import get_password_hash, verify_password
+from app.core.security import get_password_hash, password_needs_rehash, verify_password
 from app.schemas.user import UserCreate, UserUpdate
 
 
@@ -121,4 +121,9 @@ class UserService:
             return None  # Cannot login if account is deleted
         if not verify_password(password, user.hashed_password):
             return None
+        if password_needs_rehash(user.hashed_password):
+            # Upgrade legacy bcrypt hashes now that we have the plain password
+            user.hashed_password = get_password_hash(password)
+            await db.commit()
+            await db.refresh(user)
         return user
@@ -0,0 +1,174 @@
+"""Shared pytest fixtures."""
+import os
+from functools import lru_cache
+
+import pytest
+import pytest_asyncio
+from argon2.exceptions import VerifyMismatchError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core import security
+from app.core.config import settings
+from app.core.database import Base
+from app.core.security import get_password_hash
+# Register every model on Base.metadata, including ones app.models doesn't re-export
+import app.models  # noqa: F401
+import app.models.vault  # noqa: F401
+from app.models.user import User
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_argon2():
+    """Use a cheap Argon2id profile so hashing doesn't dominate test time."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "ARGON2_TIME_COST", 1)
+        mp.setattr(settings, "ARGON2_MEMORY_COST", 8192)
+        mp.setattr(settings, "ARGON2_PARALLELISM", 1)
+        yield
+
+
+class _PlaintextHasher:
+    """Stand-in for argon2's PasswordHasher that stores a tagged copy of the password."""
+
+    def hash(self, password):
+        return "plain$" + password
+
+    def verify(self, hashed, password):
+        if hashed != "plain$" + password:
+            raise VerifyMismatchError()
+        return True
+
+    def check_needs_rehash(self, hashed):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def plaintext_passwords(request, monkeypatch):
+    """Skip Argon2 entirely when SCROOGE_FAST_HASH=1 is set.
+
+    Tests marked ``real_hash`` always get the real implementation.
+    """
+    if os.environ.get("SCROOGE_FAST_HASH") != "1" or request.node.get_closest_marker("real_hash"):
+        return
+    monkeypatch.setattr(security, "_password_hasher", _PlaintextHasher)
+
+
+def pytest_collection_modifyitems(items):
+    """Run async tests on the session event loop shared with the session-scoped engine.
+
+    Tests marked ``fresh_db`` also get ``fresh_db_session`` set up first, so
+    ``db_session`` can hand it out instead of a savepoint-wrapped session.
+    """
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if pytest_asyncio.is_async_test(item):
+            item.add_marker(session_loop, append=False)
+        if item.get_closest_marker("fresh_db") and "fresh_db_session" not in item.fixturenames:
+            item.fixturenames.insert(0, "fresh_db_session")
+
+
+def _sqlite_memory_engine():
+    return create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+
+@pytest_asyncio.fixture(scope="session")
+async def test_engine():
+    """One in-memory database with the schema, created once per test session."""
+    engine = _sqlite_memory_engine()
+
+    # pysqlite's own transaction handling breaks SAVEPOINTs; let SQLAlchemy emit BEGIN
+    @event.listens_for(engine.sync_engine, "connect")
+    def _disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def fresh_db_session():
+    """Session on a database of its own, with the schema created for this test only.
+
+    Opt in with ``@pytest.mark.fresh_db``; commits are real and nothing is
+    shared with the session-scoped engine, at the cost of DDL per test.
+    """
+    engine = _sqlite_memory_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db_session(request, test_engine):
+    """Session bound to an outer transaction that is rolled back after the test.
+
+    ``commit()`` inside the test (or the code under test) only releases a
+    SAVEPOINT, so every test starts from the empty schema without DDL.
+    Tests marked ``fresh_db`` get ``fresh_db_session`` instead.
+    """
+    if request.node.get_closest_marker("fresh_db"):
+        yield request.getfixturevalue("fresh_db_session")
+        return
+    async with test_engine.connect() as conn:
+        trans = await conn.begin()
+        async with AsyncSession(
+            bind=conn,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        ) as session:
+            yield session
+        await trans.rollback()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def seed_user(test_engine) -> int:
+    """Id of a user committed once per session, outside the per-test rollback."""
+    async with AsyncSession(test_engine, expire_on_commit=False) as session:
+        user = User(username="seed", hashed_password="hash")
+        session.add(user)
+        await session.commit()
+        return user.id
+
+
+@pytest.fixture
+def captured_selects(test_engine):
+    """``(statement, parameters)`` of every SELECT the test engine runs during the test."""
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+    
+    event.listen(test_engine.sync_engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(test_engine.sync_engine, "before_cursor_execute", capture)
+
+
+@pytest.fixture
+def explain(db_session):
+    """Return SQLite's EXPLAIN QUERY PLAN details for a statement, one step per line."""
+    async def _explain(statement: str, parameters) -> str:
+        conn = await db_session.connection()
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return "\n".join(row[-1] for row in result)
+    return _explain
+
+
+@pytest.fixture(scope="session")
+def password_hash(fast_argon2):
+    """Hash function memoized for the session, so each test password is derived once."""
+    return lru_cache(maxsize=None)(get_password_hash)
@@ -1,56 +1,18 @@
 """Integration tests for API endpoints."""
 import pytest
 import pytest_asyncio
-import asyncio
 from datetime import datetime
 from decimal import Decimal
 from httpx import AsyncClient, ASGITransport
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import get_db
 from app.models.user import User
 from app.models.transaction import Transaction, TransactionType, TransactionSource
 from app.core.security import create_access_token, get_password_hash
 
 
-# Test database
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(
-    TEST_DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False},
-)
-TestingSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-@pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
-
-
-@pytest_asyncio.fixture
-async def db_session():
-    """Create a test database session."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    async with TestingSessionLocal() as session:
-        yield session
-        
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
 @pytest_asyncio.fixture
 async def client(db_session):
     """Create a test client with overridden database."""
@@ -80,8 +42,7 @@ async def test_user(db_session: AsyncSession) -> User:
         is_admin=False
     )
     db_session.add(user)
-    await db_session.commit()
-    await db_session.refresh(user)
+    await db_session.flush()
     return user
 
 
@@ -1,6 +1,7 @@
 """Tests for currency service."""
 import pytest
 from decimal import Decimal
+from app.core.security import _truncate_password, get_password_hash, verify_password
 from app.services.currency_service import CurrencyService
 
 
@@ -56,8 +57,6 @@ class TestCurrencyConversion:
 
     def test_truncate_long_password(self):
         """Test that passwords longer than 72 bytes are truncated."""
-        from app.core.security import _truncate_password
-        
         long_password = "a" * 100
         truncated = _truncate_password(long_password)
         
@@ -65,8 +64,6 @@ class TestCurrencyConversion:
 
     def test_truncate_unicode_password(self):
         """Test that unicode passwords are properly truncated by bytes."""
-        from app.core.security import _truncate_password
-        
         # Russian characters are 2 bytes each in UTF-8
         unicode_password = "пароль" * 20  # 120 bytes
         truncated = _truncate_password(unicode_password)
@@ -76,31 +73,26 @@ class TestCurrencyConversion:
 
 
 class TestPasswordHashing:
-    """Test password hashing with bcrypt."""
+    """Test password hashing with Argon2id."""
 
     def test_short_password_hash(self):
         """Test hashing short password."""
-        from app.core.security import get_password_hash, verify_password
-        
         password = "12345"
         hashed = get_password_hash(password)
         
         assert verify_password(password, hashed)
 
     def test_long_password_hash(self):
-        """Test hashing long password (should be truncated)."""
-        from app.core.security import get_password_hash, verify_password
-        
+        """Test hashing long password (hashed in full, not truncated)."""
         password = "a" * 100
         hashed = get_password_hash(password)
         
-        # First 72 chars should verify
-        assert verify_password("a" * 72, hashed)
+        assert verify_password(password, hashed)
+        # First 72 chars are a different password
+        assert not verify_password("a" * 72, hashed)
 
     def test_unicode_password_hash(self):
         """Test hashing unicode password."""
-        from app.core.security import get_password_hash, verify_password
-        
         password = "пароль" * 10
         hashed = get_password_hash(password)
         
@@ -111,8 +103,6 @@ class TestPasswordHashing:
 
     def test_wrong_password_fails(self):
         """Test that wrong password doesn't verify."""
-        from app.core.security import get_password_hash, verify_password
-        
         password = "correct_password"
         wrong_password = "wrong_password"
         hashed = get_password_hash(password)
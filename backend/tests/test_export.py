@@ -4,51 +4,26 @@ import pytest_asyncio
 import csv
 import io
 from decimal import Decimal
-from datetime import datetime, timezone
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import StaticPool
-from fastapi.testclient import TestClient
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from sqlalchemy.ext.asyncio import AsyncSession
+from httpx import AsyncClient, ASGITransport
 
-from app.core.database import Base
+from app.core.database import get_db
+from app.core.security import create_access_token
 from app.main import app
 from app.services.transaction_service import TransactionService
 from app.models.transaction import Transaction, TransactionType, TransactionSource
 from app.models.user import User
 
-# Create test database engine
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(
-    TEST_DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False},
-)
-TestingSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-
-async def drop_db():
-    """Drop database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture(scope="function")
-async def db_session():
-    """Create a test database session with tables."""
-    await init_db()
-    async with TestingSessionLocal() as session:
-        yield session
-    await drop_db()
+# Shared fixture values; immutable, so built once per module
+_DT_FEB15 = datetime(2026, 2, 15, 12, 0, 0)
+_DT_FEB1 = datetime(2026, 2, 1, 9, 0, 0)
+_DT_FEB10 = datetime(2026, 2, 10, 15, 30, 0)
+_DT_FEB16 = datetime(2026, 2, 16, 12, 0, 0)
+_AMOUNT_LUNCH = Decimal("100.50")
+_AMOUNT_SALARY = Decimal("5000.00")
+_AMOUNT_FIFTY = Decimal("50.00")
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -60,8 +35,7 @@ async def test_user(db_session: AsyncSession):
         currency="USD"
     )
     db_session.add(user)
-    await db_session.commit()
-    await db_session.refresh(user)
+    await db_session.flush()
     return user
 
 
@@ -74,12 +48,12 @@ async def test_transactions(db_session: AsyncSession, test_user: User):
     t1 = Transaction(
         user_id=test_user.id,
         type=TransactionType.EXPENSE,
-        amount=Decimal("100.50"),
+        amount=_AMOUNT_LUNCH,
         category_name="Food",
         description="Lunch",
-        transaction_date=datetime(2026, 2, 15, 12, 0, 0),
-        source=TransactionSource.manual,
-        created_at=datetime(2026, 2, 15, 12, 0, 0)
+        transaction_date=_DT_FEB15,
+        source=TransactionSource.MANUAL,
+        created_at=_DT_FEB15
     )
     transactions.append(t1)
     
@@ -87,12 +61,12 @@ async def test_transactions(db_session: AsyncSession, test_user: User):
     t2 = Transaction(
         user_id=test_user.id,
         type=TransactionType.INCOME,
-        amount=Decimal("5000.00"),
+        amount=_AMOUNT_SALARY,
         category_name="Salary",
         description=None,
-        transaction_date=datetime(2026, 2, 1, 9, 0, 0),
-        source=TransactionSource.manual,
-        created_at=datetime(2026, 2, 1, 9, 0, 0)
+        transaction_date=_DT_FEB1,
+        source=TransactionSource.MANUAL,
+        created_at=_DT_FEB1
     )
     transactions.append(t2)
     
@@ -100,18 +74,16 @@ async def test_transactions(db_session: AsyncSession, test_user: User):
     t3 = Transaction(
         user_id=test_user.id,
         type=TransactionType.EXPENSE,
-        amount=Decimal("50.00"),
+        amount=_AMOUNT_FIFTY,
         category_name="Transport",
         description="Taxi",
         transaction_date=None,
-        source=TransactionSource.manual,
-        created_at=datetime(2026, 2, 10, 15, 30, 0)
+        source=TransactionSource.MANUAL,
+        created_at=_DT_FEB10
     )
     transactions.append(t3)
     
-    for t in transactions:
-        db_session.add(t)
-    
+    db_session.add_all(transactions)
     await db_session.commit()
     return transactions
 
@@ -125,16 +97,46 @@ class TestExportService:
         result = await TransactionService.get_all_for_export(db_session, test_user.id)
         
         assert len(result) == 3
-        # Should be ordered by transaction_date desc
+        # Should be ordered by transaction_date desc, undated last
         assert result[0].category_name == "Food"  # Feb 15
-        assert result[1].category_name == "Transport"  # None (comes after dates)
-        assert result[2].category_name == "Salary"  # Feb 1
+        assert result[1].category_name == "Salary"  # Feb 1
+        assert result[2].category_name == "Transport"  # None
+    
+    @pytest.mark.asyncio
+    async def test_stream_for_export(self, db_session: AsyncSession, test_user: User, test_transactions):
+        """Test stream_for_export yields transactions newest first across batches."""
+        streamed = [
+            t async for t in TransactionService.stream_for_export(db_session, test_user.id, batch_size=2)
+        ]
+        
+        assert [t.category_name for t in streamed] == ["Food", "Salary", "Transport"]
+    
+    @pytest.mark.asyncio
+    async def test_export_query_uses_index(self, db_session: AsyncSession, test_user: User, captured_selects, explain):
+        """Test the export query is served by ix_tx_user_date instead of a scan + sort."""
+        await TransactionService.get_all_for_export(db_session, test_user.id, type=TransactionType.EXPENSE)
+        
+        plan = await explain(*captured_selects[-1])
+        assert "USING INDEX ix_tx_user_date" in plan
+        assert "TEMP B-TREE" not in plan  # no separate ORDER BY sort
+    
+    @pytest.mark.asyncio
+    async def test_export_date_filter_uses_index(self, db_session: AsyncSession, test_user: User, captured_selects, explain):
+        """Test the date bounds are plain column comparisons the index can range-scan."""
+        await TransactionService.get_all_for_export(
+            db_session, test_user.id,
+            date_from=_DT_FEB1,
+            date_to=datetime(2026, 2, 5, 23, 59, 59)
+        )
+        
+        plan = await explain(*captured_selects[-1])
+        assert "USING INDEX ix_tx_user_date (user_id=? AND transaction_date>? AND transaction_date<?)" in plan
     
     @pytest.mark.asyncio
     async def test_get_all_for_export_with_type_filter(self, db_session: AsyncSession, test_user: User, test_transactions):
         """Test get_all_for_export with type filter."""
         result = await TransactionService.get_all_for_export(
-            db_session, test_user.id, type=TransactionType.income
+            db_session, test_user.id, type=TransactionType.INCOME
         )
         
         assert len(result) == 1
@@ -156,8 +158,6 @@ class TestExportService:
     @pytest.mark.asyncio
     async def test_get_all_for_export_with_timezone_aware_dates(self, db_session: AsyncSession, test_user: User, test_transactions):
         """Test get_all_for_export handles timezone-aware dates correctly."""
-        from datetime import timezone, timedelta
-        
         # Use timezone-aware dates (as they come from frontend)
         tz = timezone(timedelta(hours=0))  # UTC
         result = await TransactionService.get_all_for_export(
@@ -173,8 +173,6 @@ class TestExportService:
     
     def test_normalize_datetime(self):
         """Test _normalize_datetime helper method."""
-        from datetime import timezone, timedelta
-        
         # Test with timezone-aware datetime
         tz = timezone(timedelta(hours=3))  # UTC+3
         aware_dt = datetime(2026, 2, 15, 15, 30, 0, tzinfo=tz)
@@ -215,17 +213,17 @@ class TestExportService:
         assert food['descriptions'] == 'Lunch'  # Description collected
     
     @pytest.mark.asyncio
-    async def test_get_grouped_for_export_with_multiple_same_category(self, db_session: AsyncSession, test_user: User):
+    async def test_get_grouped_for_export_with_multiple_same_category(self, db_session: AsyncSession, test_user: User, test_transactions):
         """Test grouping sums multiple transactions and collects descriptions."""
         # Add another Food expense with different description
         t = Transaction(
             user_id=test_user.id,
             type=TransactionType.EXPENSE,
-            amount=Decimal("50.00"),
+            amount=_AMOUNT_FIFTY,
             category_name="Food",
             description="Dinner",
-            transaction_date=datetime(2026, 2, 16, 12, 0, 0),
-            source=TransactionSource.manual,
+            transaction_date=_DT_FEB16,
+            source=TransactionSource.MANUAL,
         )
         db_session.add(t)
         await db_session.commit()
@@ -235,16 +233,35 @@ class TestExportService:
         food = next((r for r in result if r['category'] == 'Food'), None)
         assert food is not None
         assert food['expense'] == -150.5  # -100.5 + -50.0
-        assert 'Dinner' in food['descriptions']
-        assert 'Lunch' in food['descriptions']
+        assert food['descriptions'] == 'Dinner\nLunch'  # each distinct description once, sorted
 
+    
+    @pytest.mark.asyncio
+    async def test_get_grouped_for_export_empty_category_name(self, db_session: AsyncSession, test_user: User):
+        """Test transactions with an empty category name are grouped as Uncategorized."""
+        db_session.add(Transaction(
+            user_id=test_user.id,
+            type=TransactionType.EXPENSE,
+            amount=_AMOUNT_FIFTY,
+            category_name="",
+            description="Cash",
+            transaction_date=_DT_FEB16,
+            source=TransactionSource.MANUAL,
+        ))
+        await db_session.flush()
+        
+        result = await TransactionService.get_grouped_for_export(db_session, test_user.id)
+        
+        assert [r['category'] for r in result] == ['Uncategorized']
+        assert result[0]['expense'] == -50.0
 
 class TestExportCSV:
     """Test CSV export endpoint."""
     
-    def test_export_csv_with_data(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_csv_with_data(self, client, auth_headers, test_transactions):
         """Test CSV export returns correct data format."""
-        response = client.get("/v1/export/csv", headers=auth_headers)
+        response = await client.get("/v1/export/csv", headers=auth_headers)
         
         assert response.status_code == 200
         assert response.headers["content-type"] == "text/csv; charset=utf-8"
@@ -253,57 +270,58 @@ class TestExportCSV:
         # Parse CSV response
         content = response.content.decode('utf-8-sig')
         csv_reader = csv.reader(io.StringIO(content))
-        rows = list(csv_reader)
         
         # Check header (Amount, Category, Description, Transaction Date, Created At)
-        assert rows[0] == [
+        assert next(csv_reader) == [
             "Amount", "Category", "Description",
             "Transaction Date", "Created At"
         ]
         
-        # Check data rows (should have 3 transactions)
-        assert len(rows) == 4  # header + 3 transactions
-        
         # Check first transaction (expense should be negative)
-        assert rows[1][0] == "-100.5"  # Amount negative for expense
-        assert rows[1][1] == "Food"
-        assert rows[1][2] == "Lunch"
-        assert "2026-02-15" in rows[1][3]  # Transaction Date
+        first = next(csv_reader)
+        assert first[0] == "-100.5"  # Amount negative for expense
+        assert first[1] == "Food"
+        assert first[2] == "Lunch"
+        assert "2026-02-15" in first[3]  # Transaction Date
         
         # Check second transaction (income should be positive)
-        assert rows[2][0] == "5000.0"  # Amount positive for income
-        assert rows[2][1] == "Salary"
-        assert rows[2][2] == ""  # Description should be empty string
+        second = next(csv_reader)
+        assert second[0] == "5000.0"  # Amount positive for income
+        assert second[1] == "Salary"
+        assert second[2] == ""  # Description should be empty string
         
         # Check third transaction
-        assert rows[3][0] == "-50.0"  # Amount negative for expense
-        assert rows[3][3] == ""  # Transaction Date should be empty string
-    
-    def test_export_tsv_format(self, client, auth_headers, test_transactions):
-        """Test TSV export format."""
-        response = client.get("/v1/export/csv?format=tsv", headers=auth_headers)
+        third = next(csv_reader)
+        assert third[0] == "-50.0"  # Amount negative for expense
+        assert third[3] == ""  # Transaction Date should be empty string
         
-        assert response.status_code == 200
-        assert response.headers["content-type"] == "text/tab-separated-values"
-        assert ".tsv" in response.headers["content-disposition"]
-        
-        # Parse TSV response
-        content = response.content.decode('utf-8')
-        tsv_reader = csv.reader(io.StringIO(content), delimiter='\t')
-        rows = list(tsv_reader)
-        
-        # Check header
-        assert rows[0][0] == "Amount"
-        assert rows[0][1] == "Category"
-        
-        # Check data
-        assert len(rows) == 4  # header + 3 transactions
-        assert rows[1][0] == "-100.5"  # Expense negative
-        assert rows[2][0] == "5000.0"  # Income positive
+        # Nothing after the 3 transactions
+        assert sum(1 for _ in csv_reader) == 0
+    
+    @pytest.mark.asyncio
+    async def test_export_tsv_format(self, client, auth_headers, test_transactions):
+        """Test TSV export format, read line by line from the streamed response."""
+        async with client.stream("GET", "/v1/export/csv?format=tsv", headers=auth_headers) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/tab-separated-values")
+            assert ".tsv" in response.headers["content-disposition"]
+            
+            lines = response.aiter_lines()
+            
+            # Check header
+            header = (await anext(lines)).split('\t')
+            assert header[0] == "Amount"
+            assert header[1] == "Category"
+            
+            # Check data
+            assert (await anext(lines)).split('\t')[0] == "-100.5"  # Expense negative
+            assert (await anext(lines)).split('\t')[0] == "5000.0"  # Income positive
+            assert len([line async for line in lines if line]) == 1  # 3 transactions in total
     
-    def test_export_xlsx_format(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_xlsx_format(self, client, auth_headers, test_transactions):
         """Test XLSX export format."""
-        response = client.get("/v1/export/csv?format=xlsx", headers=auth_headers)
+        response = await client.get("/v1/export/csv?format=xlsx", headers=auth_headers)
         
         assert response.status_code == 200
         assert response.headers["content-type"] == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
@@ -313,9 +331,10 @@ class TestExportCSV:
         content = response.content
         assert content[:4] == b'PK\x03\x04'  # ZIP file signature
     
-    def test_export_csv_with_date_filter(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_csv_with_date_filter(self, client, auth_headers, test_transactions):
         """Test CSV export with date range filter."""
-        response = client.get(
+        response = await client.get(
             "/v1/export/csv?date_from=2026-02-01T00:00:00&date_to=2026-02-05T23:59:59",
             headers=auth_headers
         )
@@ -324,15 +343,16 @@ class TestExportCSV:
         
         content = response.content.decode('utf-8-sig')
         csv_reader = csv.reader(io.StringIO(content))
-        rows = list(csv_reader)
+        next(csv_reader)  # header
         
         # Should only include Salary transaction (Feb 1)
-        assert len(rows) == 2  # header + 1 transaction
-        assert rows[1][1] == "Salary"
+        assert next(csv_reader)[1] == "Salary"
+        assert sum(1 for _ in csv_reader) == 0
     
-    def test_export_csv_with_type_filter(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_csv_with_type_filter(self, client, auth_headers, test_transactions):
         """Test CSV export with type filter."""
-        response = client.get(
+        response = await client.get(
             "/v1/export/csv?type=income",
             headers=auth_headers
         )
@@ -341,36 +361,39 @@ class TestExportCSV:
         
         content = response.content.decode('utf-8-sig')
         csv_reader = csv.reader(io.StringIO(content))
-        rows = list(csv_reader)
+        next(csv_reader)  # header
         
         # Should only include income transaction (positive amount)
-        assert len(rows) == 2  # header + 1 income
-        assert rows[1][0] == "5000.0"  # Positive amount
-        assert rows[1][1] == "Salary"
+        income = next(csv_reader)
+        assert income[0] == "5000.0"  # Positive amount
+        assert income[1] == "Salary"
+        assert sum(1 for _ in csv_reader) == 0
     
-    def test_export_csv_empty(self, client, auth_headers):
+    @pytest.mark.asyncio
+    async def test_export_csv_empty(self, client, auth_headers):
         """Test CSV export when no transactions exist."""
-        response = client.get("/v1/export/csv", headers=auth_headers)
+        response = await client.get("/v1/export/csv", headers=auth_headers)
         
         assert response.status_code == 200
         
         content = response.content.decode('utf-8-sig')
         csv_reader = csv.reader(io.StringIO(content))
-        rows = list(csv_reader)
         
         # Should only have header row
-        assert len(rows) == 1
-        assert rows[0][0] == "ID"
+        assert next(csv_reader)[0] == "Amount"
+        assert sum(1 for _ in csv_reader) == 0
     
-    def test_export_csv_unauthorized(self, client):
+    @pytest.mark.asyncio
+    async def test_export_csv_unauthorized(self, client):
         """Test CSV export without authentication fails."""
-        response = client.get("/v1/export/csv")
+        response = await client.get("/v1/export/csv")
         
         assert response.status_code == 401
     
-    def test_export_grouped_csv(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_grouped_csv(self, client, auth_headers, test_transactions):
         """Test grouped CSV export."""
-        response = client.get("/v1/export/csv?grouped=true", headers=auth_headers)
+        response = await client.get("/v1/export/csv?grouped=true", headers=auth_headers)
         
         assert response.status_code == 200
         assert response.headers["content-type"] == "text/csv; charset=utf-8"
@@ -378,34 +401,36 @@ class TestExportCSV:
         
         content = response.content.decode('utf-8-sig')
         csv_reader = csv.reader(io.StringIO(content))
-        rows = list(csv_reader)
         
         # Check header includes Descriptions
-        assert rows[0] == ["Income", "Expense", "Category", "Descriptions"]
-        
-        # Check data rows (header + 3 categories + empty row + totals)
-        assert len(rows) == 6
+        assert next(csv_reader) == ["Income", "Expense", "Category", "Descriptions"]
         
         # First row should be Income (Salary)
-        assert rows[1][0] == "5000.0"  # Income
-        assert rows[1][1] == ""  # No expense
-        assert rows[1][2] == "Salary"
-        
-        # Find Food row (expense)
-        food_row = next((r for r in rows if r[2] == "Food"), None)
+        salary_row = next(csv_reader)
+        assert salary_row[0] == "5000.0"  # Income
+        assert salary_row[1] == ""  # No expense
+        assert salary_row[2] == "Salary"
+        
+        # Find Food row among the two expense categories
+        expense_rows = [next(csv_reader), next(csv_reader)]
+        food_row = next((r for r in expense_rows if r[2] == "Food"), None)
         assert food_row is not None
         assert food_row[0] == ""  # No income
         assert food_row[1] == "-100.5"  # Expense
         assert food_row[3] == "Lunch"  # Description
         
-        # Check totals row
-        assert rows[5][0] == "5000.0"  # Total income
-        assert rows[5][1] == "-150.5"  # Total expense (-100.5 + -50)
-        assert rows[5][2] == "TOTAL"
+        # Empty row, then totals row
+        assert next(csv_reader) == ["", "", "", ""]
+        totals_row = next(csv_reader)
+        assert totals_row[0] == "5000.0"  # Total income
+        assert totals_row[1] == "-150.5"  # Total expense (-100.5 + -50)
+        assert totals_row[2] == "TOTAL"
+        assert sum(1 for _ in csv_reader) == 0
     
-    def test_export_grouped_xlsx(self, client, auth_headers, test_transactions):
+    @pytest.mark.asyncio
+    async def test_export_grouped_xlsx(self, client, auth_headers, test_transactions):
         """Test grouped XLSX export."""
-        response = client.get("/v1/export/csv?format=xlsx&grouped=true", headers=auth_headers)
+        response = await client.get("/v1/export/csv?format=xlsx&grouped=true", headers=auth_headers)
         
         assert response.status_code == 200
         assert response.headers["content-type"] == "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
@@ -416,26 +441,39 @@ class TestExportCSV:
 
 
 # Fixtures for API tests
-@pytest.fixture(scope="function")
-def client(db_session):
-    """Create test client with database override."""
-    from app.core.database import get_db
-    
+@pytest_asyncio.fixture(scope="module")
+async def _client():
+    """One ASGI client for the whole module.
+
+    Requests go straight to the ASGI app, so the app lifespan (and its
+    connection to the real database) is never started.
+    """
+    async with AsyncClient(
+        transport=ASGITransport(app=app),
+        base_url="http://test"
+    ) as test_client:
+        yield test_client
+
+
+@pytest_asyncio.fixture(scope="function")
+async def client(_client, db_session):
+    """Shared test client with the database override for the current test."""
     async def override_get_db():
         yield db_session
     
     app.dependency_overrides[get_db] = override_get_db
-    
-    with TestClient(app) as test_client:
-        yield test_client
-    
+    yield _client
     app.dependency_overrides.clear()
 
 
+@lru_cache(maxsize=8)
+def _token_for(subject: str) -> str:
+    """Sign one token per subject and reuse it for the rest of the run."""
+    return create_access_token({"sub": subject})
+
+
 @pytest.fixture(scope="function")
 def auth_headers(test_user):
     """Create authorization headers with valid token."""
-    from app.core.security import create_access_token
-    
-    token = create_access_token({"sub": str(test_user.username)})
+    token = _token_for(str(test_user.id))
     return {"Authorization": f"Bearer {token}"}
@@ -5,9 +5,7 @@ import pandas as pd
 import io
 from decimal import Decimal
 from datetime import datetime, timedelta
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import insert, select
 
 # Import all models first to ensure SQLAlchemy can resolve relationships
 from app.models.vault import VaultAccount, VaultSnapshot, VaultProjectionSettings
@@ -17,55 +15,18 @@ from app.models.category import Category
 from app.models.transaction_pattern import TransactionPattern
 from app.models.mcc_code import MCCCode
 
-from app.core.database import Base
 from app.services.import_service import ImportService, ParsedTransaction, TinkoffAdapter, SberAdapter, AlfaAdapter, GenericAdapter
 from app.services.categorization_service import CategorizationService
 from app.services.transaction_service import TransactionService
 from app.services.category_service import CategoryService
 
-# Create test database engine
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
-
-engine = create_async_engine(
-    TEST_DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False},
-)
-TestingSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-
-async def drop_db():
-    """Drop database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture(scope="function")
-async def db_session():
-    """Create a test database session with tables."""
-    await init_db()
-    async with TestingSessionLocal() as session:
-        yield session
-    await drop_db()
-
 
 @pytest_asyncio.fixture(scope="function")
 async def test_user(db_session):
     """Create a test user."""
     user = User(username="testuser", hashed_password="hash", language="ru")
     db_session.add(user)
-    await db_session.commit()
-    await db_session.refresh(user)
+    await db_session.flush()
     return user
 
 
@@ -240,6 +201,55 @@ class TestImportService:
         assert len(transactions) == 1
         assert transactions[0].raw_description == 'Магазин'
 
+    def test_parse_large_csv_beyond_sniff_window(self):
+        """Test that multibyte rows past the sniffed rows are parsed in full."""
+        header = "Дата операции;Сумма операции;Описание;Категория;MCC\n"
+        row = "31.01.2026;-500,00;Магазин у дома;Супермаркеты;5411\n"
+        rows = ImportService.SNIFF_ROWS * 3
+        content = (header + row * rows).encode('utf-8')
+        transactions, adapter_name = ImportService.parse_csv(content, "test.csv")
+        
+        assert adapter_name == "TinkoffAdapter"
+        assert len(transactions) == rows
+        assert transactions[-1].amount == Decimal("500.00")
+
+    def test_parse_csv_with_quoted_newlines_across_sniff_sample(self):
+        """Test that multi-line quoted cells don't break separator sniffing."""
+        header = "Дата;Приход;Расход;Назначение платежа\n"
+        row = '15.02.2026;0;1500,00;"Оплата по договору\nАО Ромашка, НДС не облагается"\n'
+        rows = 10 * 1024 // len(row.encode('utf-8')) + 1  # 10 KB, well past the sniffed rows
+        content = (header + row * rows).encode('utf-8')
+        transactions, adapter_name = ImportService.parse_csv(content, "alfa.csv")
+        
+        assert adapter_name == "AlfaAdapter"
+        assert len(transactions) == rows
+        assert transactions[-1].raw_description == "Оплата по договору\nАО Ромашка, НДС не облагается"
+
+    def test_parse_csv_same_with_pyarrow_and_c_engine(self, monkeypatch):
+        """Test that the pyarrow and C readers hand the adapters identical values."""
+        pytest.importorskip("pyarrow")
+        content = (
+            "Date,Amount,Description\n"
+            "2026-01-01,12345678901234567890,Big\n"
+            "2026-01-03 10:11:12,-5.50,NA\n"
+            "01.03.2026,,Coffee\n"
+        ).encode('utf-8')
+        columns = ["Date", "Amount", "Description"]
+
+        results = {}
+        for pyarrow_available in (True, False):
+            monkeypatch.setattr("app.services.import_service.PYARROW_AVAILABLE", pyarrow_available)
+            results[pyarrow_available] = (
+                ImportService._read_csv(content, "utf-8", ",", columns),
+                ImportService.parse_csv(content, "generic.csv"),
+            )
+
+        pd.testing.assert_frame_equal(results[True][0], results[False][0])
+        assert results[True][1] == results[False][1]
+        transactions, _ = results[True][1]
+        assert transactions[0].amount == Decimal("12345678901234567890")
+        assert transactions[2].transaction_date == datetime(2026, 3, 1)
+
 
 class TestCategorizationService:
     """Test transaction categorization."""
@@ -305,8 +315,7 @@ class TestCategorizationService:
         # Create category
         category = Category(name="Моя категория", user_id=test_user.id)
         db_session.add(category)
-        await db_session.commit()
-        await db_session.refresh(category)
+        await db_session.flush()
         
         # Learn pattern
         pattern = await service.learn_pattern(
@@ -331,6 +340,35 @@ class TestCategorizationService:
         assert result["category"] == "Моя категория"
         assert result["confidence"] == "high"
 
+    @pytest.mark.asyncio
+    async def test_categorize_many_loads_lookups_once(self, db_session, test_user, captured_selects):
+        """Test that a batch queries patterns, MCC codes and history once each."""
+        db_session.add(MCCCode(
+            code="5411",
+            name_en="Grocery Stores",
+            name_ru="Продуктовые магазины",
+            suggested_category_en="Groceries",
+            suggested_category_ru="Продукты"
+        ))
+        await db_session.commit()
+        captured_selects.clear()
+        
+        service = CategorizationService(db_session)
+        results = await service.categorize_many(
+            test_user.id,
+            [
+                ("TEST SHOP", "5411"),
+                ("Пятерочка магазин", None),
+                ("UNKNOWN_MERCHANT_XYZ", None),
+                ("UNKNOWN_MERCHANT_ABC", None),
+            ],
+            language="ru"
+        )
+        
+        assert [r["category"] for r in results] == ["Продукты", "Продукты", "Другое", "Другое"]
+        assert [r["confidence"] for r in results] == ["high", "medium", "low", "low"]
+        assert len(captured_selects) == 3
+
 
 class TestDuplicateDetection:
     """Test duplicate transaction detection."""
@@ -426,6 +464,53 @@ class TestDuplicateDetection:
         assert transactions[0].is_duplicate is True
         assert transactions[0].duplicate_count == 1
 
+    @pytest.mark.asyncio
+    async def test_duplicate_detection_for_many_transactions(self, db_session, test_user):
+        """Test that one batch check flags only the matching parsed transactions."""
+        db_session.add(Transaction(
+            user_id=test_user.id,
+            type=TransactionType.EXPENSE,
+            amount=Decimal("500.00"),
+            category_name="Продукты",
+            raw_description="PYATYOROCHKA 6431 MOSCOW",
+            transaction_date=datetime(2026, 1, 31, 18, 58, 44),
+            source=TransactionSource.MANUAL
+        ))
+        await db_session.commit()
+        
+        parsed = [
+            # Same amount, substring description, within a day
+            ParsedTransaction(raw_description="pyatyorochka", amount=Decimal("500.00"),
+                              transaction_date=datetime(2026, 2, 1, 10, 0, 0)),
+            # Same amount and description, but a week later
+            ParsedTransaction(raw_description="PYATYOROCHKA", amount=Decimal("500.00"),
+                              transaction_date=datetime(2026, 2, 7)),
+            # Different amount
+            ParsedTransaction(raw_description="PYATYOROCHKA", amount=Decimal("499.00"),
+                              transaction_date=datetime(2026, 1, 31)),
+            # No date: any date matches
+            ParsedTransaction(raw_description="PYATYOROCHKA 6431 MOSCOW", amount=Decimal("500.00"),
+                              transaction_date=None),
+        ]
+        
+        transactions = await ImportService.check_duplicates(parsed, test_user.id, db_session)
+        
+        assert [tx.is_duplicate for tx in transactions] == [True, False, False, True]
+        assert [tx.duplicate_count for tx in transactions] == [1, 0, 0, 1]
+
+    @pytest.mark.asyncio
+    async def test_duplicate_query_uses_index(self, db_session, test_user, captured_selects, explain):
+        """Test the batch duplicate lookup is served by ix_tx_dup."""
+        parsed = [
+            ParsedTransaction(raw_description="PYATYOROCHKA", amount=Decimal("500.00"),
+                              transaction_date=datetime(2026, 1, 31))
+        ]
+        
+        await ImportService.check_duplicates(parsed, test_user.id, db_session)
+        
+        plan = await explain(*captured_selects[-1])
+        assert "USING INDEX ix_tx_dup" in plan
+
 
 class TestImportIntegration:
     """Integration tests for import functionality."""
@@ -457,12 +542,13 @@ class TestImportIntegration:
         assert transactions[0].suggested_category is not None
         assert transactions[1].suggested_category is not None
         
-        # Create transactions in DB
+        # Create transactions in DB with one multi-row INSERT
+        rows = []
         for tx_data in transactions:
             category = await CategoryService.get_or_create(
                 db_session, tx_data.suggested_category or "Другое", test_user.id
             )
-            tx = Transaction(
+            rows.append(dict(
                 user_id=test_user.id,
                 type=tx_data.type or TransactionType.EXPENSE,
                 amount=tx_data.amount,
@@ -472,9 +558,9 @@ class TestImportIntegration:
                 raw_description=tx_data.raw_description,
                 transaction_date=tx_data.transaction_date or datetime.now(),
                 source=TransactionSource.IMPORT_CSV
-            )
-            db_session.add(tx)
+            ))
         
+        await db_session.execute(insert(Transaction), rows)
         await db_session.commit()
         
         # Verify transactions were created
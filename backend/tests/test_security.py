@@ -1,57 +1,66 @@
 """Tests for security module."""
+import bcrypt
 import pytest
-from app.core.security import get_password_hash, verify_password
+from app.core.config import Settings
+from app.core.security import decode_token, password_needs_rehash, verify_password
 
 
+@pytest.mark.real_hash
+@pytest.mark.xdist_group("password_hashing")
 class TestPasswordHashing:
-    """Test password hashing with bcrypt."""
+    """Test password hashing with Argon2id."""
 
-    def test_short_password(self):
-        """Test hashing short password (normal case)."""
-        password = "12345"
-        hashed = get_password_hash(password)
+    @pytest.mark.parametrize("password", [
+        "12345",                  # short password (normal case)
+        "MySecurePassword123!",   # medium length password
+        "a" * 72,                 # exactly at the old 72 bytes bcrypt limit
+        "a" * 100,                # longer than 72 bytes
+        "пароль" * 20,            # unicode: 2 bytes per char in UTF-8, 240 bytes
+    ], ids=["short", "medium", "72_bytes", "very_long", "unicode"])
+    def test_hash_roundtrip(self, password_hash, password):
+        """Test that a hashed password verifies."""
+        hashed = password_hash(password)
+        
+        assert isinstance(hashed, str)
         assert verify_password(password, hashed)
 
-    def test_medium_password(self):
-        """Test hashing medium length password."""
-        password = "MySecurePassword123!"
-        hashed = get_password_hash(password)
-        assert verify_password(password, hashed)
+    @pytest.mark.parametrize("long_password, truncated", [
+        ("a" * 100, "a" * 72),
+        ("пароль" * 20, "пароль" * 6),  # 72 bytes of the 240-byte password
+    ], ids=["ascii", "unicode"])
+    def test_truncated_password_does_not_verify(self, password_hash, long_password, truncated):
+        """Test that passwords are hashed in full: a 72-byte prefix is a different password."""
+        hashed = password_hash(long_password)
+        
+        assert verify_password(long_password, hashed)
+        assert not verify_password(truncated, hashed)
 
-    def test_long_password_72_bytes(self):
-        """Test password exactly at 72 bytes limit."""
-        password = "a" * 72  # 72 ASCII chars = 72 bytes
-        hashed = get_password_hash(password)
-        assert verify_password(password, hashed)
+    def test_wrong_password(self, password_hash):
+        """Test that a wrong password does not verify."""
+        hashed = password_hash("MySecurePassword123!")
+        assert not verify_password("WrongPassword", hashed)
 
-    def test_very_long_password(self):
-        """Test password longer than 72 bytes (should be truncated)."""
-        password = "a" * 100  # 100 chars, will be truncated to 72
-        hashed = get_password_hash(password)
-        # First 72 chars should work
-        assert verify_password("a" * 72, hashed)
+    def test_legacy_bcrypt_hash(self):
+        """Test that bcrypt hashes from before Argon2id still verify and get flagged for rehash."""
+        hashed = bcrypt.hashpw(b"password123", bcrypt.gensalt(rounds=4)).decode('utf-8')
+        
+        assert verify_password("password123", hashed)
+        assert not verify_password("password124", hashed)
+        assert password_needs_rehash(hashed)
 
-    def test_long_password_with_unicode(self):
-        """Test password with unicode characters."""
-        # Russian characters take 2 bytes each in UTF-8
-        password = "пароль" * 20  # 12 chars * 2 bytes = 120 bytes
-        hashed = get_password_hash(password)
-        # Should not raise ValueError
-        assert isinstance(hashed, str)
-        # Verification should work
-        assert verify_password(password, hashed)
+    def test_current_hash_needs_no_rehash(self, password_hash):
+        """Test that a hash made with the current parameters is kept."""
+        assert not password_needs_rehash(password_hash("12345"))
 
-    def test_verify_truncated_password(self):
-        """Test that verification works with truncated passwords."""
-        long_password = "x" * 100
-        short_password = "x" * 72
-        
-        # Hash long password (will be truncated)
-        hashed = get_password_hash(long_password)
-        
-        # Both should verify correctly
-        assert verify_password(long_password, hashed)
-        assert verify_password(short_password, hashed)
+    def test_production_cost_parameters(self):
+        """Guard the production Argon2id defaults (tests run with a cheaper profile).
+
+        RFC 9106 low-memory profile: t=3, m=64 MiB, p=4.
+        """
+        fields = Settings.model_fields
+        assert fields["ARGON2_TIME_COST"].default >= 3
+        assert fields["ARGON2_MEMORY_COST"].default >= 65536
+        assert fields["ARGON2_PARALLELISM"].default >= 4
 
 
 class TestJWT:
@@ -59,8 +68,6 @@ class TestJWT:
 
     def test_decode_invalid_token(self):
         """Test decoding invalid token returns None."""
-        from app.core.security import decode_token
-        
         invalid_token = "invalid.token.here"
         decoded = decode_token(invalid_token)
         
@@ -68,13 +75,13 @@ class TestJWT:
     
     def test_decode_malformed_token(self):
         """Test decoding malformed token returns None."""
-        from app.core.security import decode_token
-        
         malformed_tokens = [
             "",
             "not.a.token",
             "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9",  # только header
             "invalid",
+            "a.b.c.d",
+            "bad!.segment$.here",
         ]
         
         for token in malformed_tokens:
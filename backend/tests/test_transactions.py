@@ -1,145 +1,69 @@
 """Tests for transaction service."""
 import pytest
-import pytest_asyncio
 from decimal import Decimal
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import func, select
 
-from app.core.database import Base
 from app.services.transaction_service import TransactionService
+from app.models.category import Category
 from app.models.transaction import Transaction, TransactionType, TransactionSource
 from app.models.user import User
 from app.schemas.transaction import TransactionCreate
 
-# Create test database engine
-TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
-engine = create_async_engine(
-    TEST_DATABASE_URL,
-    poolclass=StaticPool,
-    connect_args={"check_same_thread": False},
-)
-TestingSessionLocal = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-async def init_db():
-    """Initialize database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-
-async def drop_db():
-    """Drop database tables."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-
-
-@pytest_asyncio.fixture(scope="function")
-async def db_session():
-    """Create a test database session with tables."""
-    # Create tables first
-    await init_db()
-    
-    # Create session
-    async with TestingSessionLocal() as session:
-        yield session
-    
-    # Drop tables after test
-    await drop_db()
+# Invariant parts of the create payloads, shared by every parametrized run
+_FIXED_DT = datetime(2024, 1, 1, 12, 0, 0)
+_STRING_TYPE_PAYLOAD = dict(type="expense", amount=Decimal("15.00"), category_name="Продукты")  # as it comes from API
+_ENUM_TYPE_PAYLOAD = dict(type=TransactionType.INCOME, amount=Decimal("100.00"), category_name="Зарплата")
+_NEW_CATEGORY_PAYLOAD = dict(type="expense", amount=Decimal("25.00"), category_name="NewCategory")
 
 
 class TestTransactionCreation:
     """Test transaction creation."""
 
     @pytest.mark.asyncio
-    async def test_create_transaction_with_string_type(self, db_session):
-        """Test creating transaction with string type (from API)."""
-        # Create a user first
-        user = User(username="testuser", hashed_password="hash")
-        db_session.add(user)
-        await db_session.commit()
-        await db_session.refresh(user)
-        
-        # Create transaction data with string type (as it comes from API)
-        transaction_data = TransactionCreate(
-            type="expense",  # String as it comes from API
-            amount=Decimal("15.00"),
-            category_name="Продукты",
-            transaction_date=datetime.now()
-        )
+    @pytest.mark.parametrize("payload, expected_type", [
+        (_STRING_TYPE_PAYLOAD, TransactionType.EXPENSE),
+        (_ENUM_TYPE_PAYLOAD, TransactionType.INCOME),
+        (_NEW_CATEGORY_PAYLOAD, TransactionType.EXPENSE),
+    ], ids=["string_type", "enum_type", "new_category"])
+    async def test_create_transaction(self, db_session, seed_user, payload, expected_type):
+        """Test creating a transaction, including its category if it doesn't exist yet."""
+        transaction_data = TransactionCreate(**payload, transaction_date=_FIXED_DT)
         
         # Create transaction
         transaction = await TransactionService.create(
-            db_session, transaction_data, user.id
+            db_session, transaction_data, seed_user
         )
         
         # Verify
         assert transaction is not None
-        assert transaction.type == TransactionType.EXPENSE
-        assert transaction.amount == Decimal("15.00")
-        assert transaction.category_name == "Продукты"
+        assert transaction.type == expected_type
+        assert transaction.amount == payload["amount"]
+        assert transaction.category_name == payload["category_name"]
+        assert transaction.transaction_date == _FIXED_DT
         assert transaction.source == TransactionSource.MANUAL
-        assert transaction.user_id == user.id
-
-    @pytest.mark.asyncio
-    async def test_create_transaction_with_enum_type(self, db_session):
-        """Test creating transaction with enum type."""
-        # Create a user
-        user = User(username="testuser2", hashed_password="hash")
-        db_session.add(user)
-        await db_session.commit()
-        await db_session.refresh(user)
+        assert transaction.user_id == seed_user
         
-        # Create transaction data with enum type
-        transaction_data = TransactionCreate(
-            type=TransactionType.INCOME,
-            amount=Decimal("100.00"),
-            category_name="Зарплата",
-            transaction_date=datetime.now()
-        )
-        
-        # Create transaction
-        transaction = await TransactionService.create(
-            db_session, transaction_data, user.id
-        )
-        
-        # Verify
-        assert transaction is not None
-        assert transaction.type == TransactionType.INCOME
-        assert transaction.amount == Decimal("100.00")
+        # Verify category was created; get_or_create left it in the identity map
+        category = await db_session.get(Category, transaction.category_id)
+        assert category is not None
+        assert category.name == payload["category_name"]
+        assert category.user_id == seed_user
 
     @pytest.mark.asyncio
-    async def test_create_transaction_creates_category(self, db_session):
-        """Test that creating transaction creates new category if not exists."""
-        from app.services.category_service import CategoryService
-        
-        # Create a user
-        user = User(username="testuser3", hashed_password="hash")
+    @pytest.mark.fresh_db
+    async def test_create_transaction_in_fresh_database(self, db_session):
+        """Test creating a transaction on a database of its own, with real commits."""
+        user = User(username="fresh", hashed_password="hash")
         db_session.add(user)
         await db_session.commit()
-        await db_session.refresh(user)
-        
-        # Create transaction with new category
-        transaction_data = TransactionCreate(
-            type="expense",
-            amount=Decimal("25.00"),
-            category_name="NewCategory",
-            transaction_date=datetime.now()
-        )
         
-        # Create transaction
         transaction = await TransactionService.create(
-            db_session, transaction_data, user.id
+            db_session, TransactionCreate(**_STRING_TYPE_PAYLOAD, transaction_date=_FIXED_DT), user.id
         )
         
-        # Verify category was created
-        category = await CategoryService.get_by_name(
-            db_session, "NewCategory", user.id
-        )
-        assert category is not None
-        assert category.name == "NewCategory"
+        assert transaction.user_id == user.id
+        assert not db_session.in_nested_transaction()
+        # Nothing from the shared database (e.g. the seeded user) is visible
+        assert await db_session.scalar(select(func.count(User.id))) == 1